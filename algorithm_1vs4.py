@@ -6,6 +6,7 @@ class Trader:
     def __init__(self, base='bond1', alt='bond4', W=120, ENTRY=1.5, EXIT=0.5, MAX_POS=40, SIZE=10):
         self.base = base
         self.alt  = alt
+        self.subscriptions = [base, alt]
         self.W = W
         self.ENTRY = ENTRY
         self.EXIT  = EXIT
@@ -15,8 +16,7 @@ class Trader:
         self.b_alt  = deque(maxlen=W)
 
     def _mid(self, state, p):
-        L = Listing(state.orderbook[p], p)
-        bid = list(L.buy_orders.keys())[0]; ask = list(L.sell_orders.keys())[0]
+        bid = state.best_bid[p]; ask = state.best_ask[p]
         return 0.5*(bid+ask), bid, ask
 
     def run(self, state):
@@ -59,8 +59,8 @@ class Trader:
             if not L.buy_orders or not L.sell_orders:
                 continue
 
-            bid = list(L.buy_orders.keys())[0]
-            ask = list(L.sell_orders.keys())[0]
+            bid = L.best_bid
+            ask = L.best_ask
 
             self.bids.setdefault(p, deque(maxlen=self.window)).append(bid)
             self.asks.setdefault(p, deque(maxlen=self.window)).append(ask)
@@ -144,7 +144,7 @@ class Trader:
             if not listings.buy_orders or not listings.sell_orders:
                 continue
 
-            highest_bid, lowest_ask = list(listings.buy_orders.keys())[0], list(listings.sell_orders.keys())[0]
+            highest_bid, lowest_ask = listings.best_bid, listings.best_ask
             bid_qty, ask_qty = listings.buy_orders[highest_bid], listings.sell_orders[lowest_ask]
             spread = lowest_ask - highest_bid
             if spread < 3:
@@ -21,6 +21,7 @@ class Trader:
         aggressive_when_far: bool = True, # move closer when |z| >> entry_z
     ):
         self.product = product
+        self.subscriptions = [product]
         self.position_limit = position_limit
 
         self.window = window
@@ -1,126 +1,229 @@
-from typing import Dict
+from heapq import merge
+from typing import Dict, Iterator, Tuple
+import numpy as np
 from datamodel import Portfolio
+from orderbook import OrderBook, PriceLadder
 
 
-def clean_resting_orders(resting_orders: Dict[str, Dict[str, Dict[int, int]]]):
+def clean_resting_orders(resting_orders: Dict[str, OrderBook]):
     """
     Removes price levels with 0 quantity from order books.
 
     :param resting_orders: An orderbook to clean.
     """
-    for product, sides in resting_orders.items():
-        for side, book in sides.items():
-            empty_prices = [price for price, qty in book.items() if qty == 0]
-            for price in empty_prices:
-                del book[price]
+    for product, book in resting_orders.items():
+        book.remove_empty()
 
 
-def add_bot_orders(
-    bot_orders: Dict[str, Dict],
-    market_orderbook: Dict[str, Dict],
-    algo_resting_orders: Dict[str, Dict],
+def merged_prices(market: PriceLadder, algo: PriceLadder) -> Iterator[float]:
+    """
+    Distinct prices of two ladders on the same side, best-first.
+
+    :param market: The market ladder.
+    :param algo: The algo's resting ladder.
+    """
+    if not algo:
+        yield from market
+        return
+    last = None
+    for pricepoint in merge(market, algo, reverse=market.descending):
+        if pricepoint != last:
+            yield pricepoint
+            last = pricepoint
+
+
+def top_levels(prices: np.ndarray, volumes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Price and quantity of the first level with volume, over the last axis.
+
+    A bot order only ever trades its first level with volume, so this picks
+    out the bot orders of a whole round at once. Quantity is 0 where no level
+    has volume.
+
+    :param prices: Level prices, e.g. shaped [tick, product, level].
+    :param volumes: Level volumes, the same shape.
+    """
+    has_volume = volumes > 0
+    first = has_volume.argmax(axis=-1)[..., None]
+    top_prices = np.take_along_axis(prices, first, axis=-1)[..., 0]
+    top_volumes = np.take_along_axis(volumes, first, axis=-1)[..., 0]
+    return top_prices, np.where(has_volume.any(axis=-1), top_volumes, 0)
+
+
+class BotFlow:
+    """
+    The bots' orders for one tick: each product's bot buy and bot sell as
+    [product] arrays of price and quantity, with quantity 0 for no order.
+    """
+
+    __slots__ = ("product_index", "buy_prices", "buy_quantities", "sell_prices", "sell_quantities")
+
+    def __init__(
+        self,
+        product_index: Dict[str, int],
+        buy_prices: np.ndarray,
+        buy_quantities: np.ndarray,
+        sell_prices: np.ndarray,
+        sell_quantities: np.ndarray,
+    ) -> None:
+        self.product_index = product_index
+        self.buy_prices = buy_prices
+        self.buy_quantities = buy_quantities
+        self.sell_prices = sell_prices
+        self.sell_quantities = sell_quantities
+
+    @classmethod
+    def from_orders(cls, bot_orders: Dict[str, Dict]) -> "BotFlow":
+        """
+        :param bot_orders: Bot orders in the same format as the orderbook.
+        """
+        tops = {"BUY": ([], []), "SELL": ([], [])}
+        for sides in bot_orders.values():
+            for side, (prices, quantities) in tops.items():
+                levels = sides.get(side, {})
+                price = next(iter(levels), 0)
+                prices.append(price)
+                quantities.append(levels.get(price, 0))
+        return cls(
+            {product: i for i, product in enumerate(bot_orders)},
+            np.array(tops["BUY"][0]),
+            np.array(tops["BUY"][1], dtype=np.int64),
+            np.array(tops["SELL"][0]),
+            np.array(tops["SELL"][1], dtype=np.int64),
+        )
+
+
+def add_bot_flow(
+    flow: BotFlow,
+    market_orderbook: Dict[str, OrderBook],
+    algo_resting_orders: Dict[str, OrderBook],
     portfolio: Portfolio,
     pos_limit: Dict[str, int],
 ) -> None:
     """
-    Process bot orders against the market and algo resting orders.
+    Process one tick of bot orders against the market and algo resting orders.
 
-    :param bot_orders: Bot orders in the same format as the orderbook
+    Only a bot order that reaches a resting algo order can change anything
+    the simulation keeps: the market book is rebuilt from the data every
+    tick, and the bots leave its price levels in place. So the book is only
+    walked for products where a bot order crosses the algo's best resting
+    price; all other bot orders are skipped.
+
+    :param flow: The tick's bot orders
     :param market_orderbook: The main market orderbook
     :param algo_resting_orders: The algo's resting orders
     :param portfolio: The portfolio to be updated
     :param pos_limit: The maximum quantity the portfolio can hold
     """
+    for product, algo_book in algo_resting_orders.items():
+        col = flow.product_index.get(product)
+        if col is None:
+            continue
+
+        bot_quantity = flow.buy_quantities[col]
+        if bot_quantity > 0 and algo_book.asks:
+            bot_price = flow.buy_prices[col].item()
+            if algo_book.asks.best_price() <= bot_price:
+                bot_buy(
+                    product, bot_price, int(bot_quantity),
+                    market_orderbook[product].asks, algo_book.asks, portfolio, pos_limit,
+                )
+
+        bot_quantity = flow.sell_quantities[col]
+        if bot_quantity > 0 and algo_book.bids:
+            bot_price = flow.sell_prices[col].item()
+            if algo_book.bids.best_price() >= bot_price:
+                bot_sell(
+                    product, bot_price, int(bot_quantity),
+                    market_orderbook[product].bids, algo_book.bids, portfolio, pos_limit,
+                )
 
-    for product, sides in bot_orders.items():
-        if "BUY" in sides:
-            bot_buy_orders = sides["BUY"]
-            best_bot_buy_price = next(iter(bot_buy_orders.keys()), -1)
-
-            if best_bot_buy_price != -1:
-                bot_quantity = bot_buy_orders[best_bot_buy_price]
-
-                all_sell_prices = set(market_orderbook[product]["SELL"].keys())
-                if product in algo_resting_orders:
-                    all_sell_prices.update(algo_resting_orders[product]["SELL"].keys())
-
-                for pricepoint in sorted(all_sell_prices):
-                    if best_bot_buy_price < pricepoint:
-                        break
-                    if bot_quantity == 0:
-                        break
-
-                    market_sells = market_orderbook[product]["SELL"]
-                    if pricepoint in market_sells:
-                        available_market = market_sells[pricepoint]
-                        filled = min(bot_quantity, available_market)
+    clean_resting_orders(algo_resting_orders)
 
-                        if filled > 0:
-                            market_sells[pricepoint] -= filled
-                            bot_quantity -= filled
 
-                    if bot_quantity > 0 and product in algo_resting_orders:
-                        algo_sells = algo_resting_orders[product]["SELL"]
-                        if pricepoint in algo_sells:
-                            available_algo = algo_sells[pricepoint]
+def bot_buy(
+    product: str,
+    best_bot_buy_price: float,
+    bot_quantity: int,
+    market_sells: PriceLadder,
+    algo_sells: PriceLadder,
+    portfolio: Portfolio,
+    pos_limit: Dict[str, int],
+) -> None:
+    """
+    Walk a bot buy order up the market and algo asks, market first at each price.
+    """
+    for pricepoint in merged_prices(market_sells, algo_sells):
+        if best_bot_buy_price < pricepoint:
+            break
+        if bot_quantity == 0:
+            break
 
-                            sell_room = int(
-                                pos_limit[product] + portfolio.quantity.get(product, 0)
-                            )
+        if pricepoint in market_sells:
+            available_market = market_sells[pricepoint]
+            filled = min(bot_quantity, available_market)
 
-                            filled = min(bot_quantity, available_algo, sell_room)
+            if filled > 0:
+                market_sells.decrement(pricepoint, filled)
+                bot_quantity -= filled
 
-                            if filled > 0:
-                                # print(f"sold {filled} @ {pricepoint}")
-                                portfolio.quantity[product] -= filled
-                                portfolio.cash += filled * pricepoint
+        if bot_quantity > 0 and pricepoint in algo_sells:
+            available_algo = algo_sells[pricepoint]
 
-                                algo_sells[pricepoint] -= filled
-                                bot_quantity -= filled
+            sell_room = int(
+                pos_limit[product] + portfolio.quantity.get(product, 0)
+            )
 
-        if "SELL" in sides:
-            bot_sell_orders = sides["SELL"]
-            best_bot_sell_price = next(iter(bot_sell_orders.keys()), -1)
+            filled = min(bot_quantity, available_algo, sell_room)
 
-            if best_bot_sell_price != -1:
-                bot_quantity = bot_sell_orders[best_bot_sell_price]
+            if filled > 0:
+                # print(f"sold {filled} @ {pricepoint}")
+                portfolio.quantity[product] -= filled
+                portfolio.cash += filled * pricepoint
 
-                all_buy_prices = set(market_orderbook[product]["BUY"].keys())
-                if product in algo_resting_orders:
-                    all_buy_prices.update(algo_resting_orders[product]["BUY"].keys())
+                algo_sells.decrement(pricepoint, filled)
+                bot_quantity -= filled
 
-                for pricepoint in sorted(all_buy_prices, reverse=True):
-                    if best_bot_sell_price > pricepoint:
-                        break
-                    if bot_quantity == 0:
-                        break
 
-                    market_buys = market_orderbook[product]["BUY"]
-                    if pricepoint in market_buys:
-                        available_market = market_buys[pricepoint]
-                        filled = min(bot_quantity, available_market)
+def bot_sell(
+    product: str,
+    best_bot_sell_price: float,
+    bot_quantity: int,
+    market_buys: PriceLadder,
+    algo_buys: PriceLadder,
+    portfolio: Portfolio,
+    pos_limit: Dict[str, int],
+) -> None:
+    """
+    Walk a bot sell order down the market and algo bids, market first at each price.
+    """
+    for pricepoint in merged_prices(market_buys, algo_buys):
+        if best_bot_sell_price > pricepoint:
+            break
+        if bot_quantity == 0:
+            break
 
-                        if filled > 0:
-                            market_buys[pricepoint] -= filled
-                            bot_quantity -= filled
+        if pricepoint in market_buys:
+            available_market = market_buys[pricepoint]
+            filled = min(bot_quantity, available_market)
 
-                    if bot_quantity > 0 and product in algo_resting_orders:
-                        algo_buys = algo_resting_orders[product]["BUY"]
-                        if pricepoint in algo_buys:
-                            available_algo = algo_buys[pricepoint]
+            if filled > 0:
+                market_buys.decrement(pricepoint, filled)
+                bot_quantity -= filled
 
-                            buy_room = int(
-                                pos_limit[product] - portfolio.quantity.get(product, 0)
-                            )
+        if bot_quantity > 0 and pricepoint in algo_buys:
+            available_algo = algo_buys[pricepoint]
 
-                            filled = min(bot_quantity, available_algo, buy_room)
+            buy_room = int(
+                pos_limit[product] - portfolio.quantity.get(product, 0)
+            )
 
-                            if filled > 0:
-                                # print(f"bought {filled} @ {pricepoint}")
-                                portfolio.quantity[product] += filled
-                                portfolio.cash -= filled * pricepoint
+            filled = min(bot_quantity, available_algo, buy_room)
 
-                                algo_buys[pricepoint] -= filled
-                                bot_quantity -= filled
+            if filled > 0:
+                # print(f"bought {filled} @ {pricepoint}")
+                portfolio.quantity[product] += filled
+                portfolio.cash -= filled * pricepoint
 
-    clean_resting_orders(algo_resting_orders)
+                algo_buys.decrement(pricepoint, filled)
+                bot_quantity -= filled
@@ -0,0 +1,106 @@
+import logging
+import os
+import pickle
+import random
+from typing import Any, Dict
+
+import numpy as np
+
+CHECKPOINT_VERSION = 1
+
+
+class Checkpoint:
+    """
+    Everything main.main needs to carry on a run after the tick at timestamp:
+    the portfolio, the order engine (open orders, pending fills, the fill
+    ledger and the pre-trade gate's counts), the Trader instance, main's own
+    loop state and the global random number generators' states.
+    """
+
+    def __init__(
+        self,
+        round_data_path: str,
+        trading_algo: str,
+        timestamp: int,
+        portfolio,
+        engine,
+        trader,
+        loop: Dict[str, Any],
+    ) -> None:
+        """
+        :param round_data_path: Round being simulated.
+        :param trading_algo: Trading algo file the Trader came from.
+        :param timestamp: Last timestamp simulated; a resumed run starts after it.
+        :param portfolio: The portfolio.
+        :param engine: The OrderEngine.
+        :param trader: The Trader instance.
+        :param loop: main's loop variables, by name.
+        """
+        self.version = CHECKPOINT_VERSION
+        self.round_data_path = round_data_path
+        self.trading_algo = trading_algo
+        self.timestamp = timestamp
+        self.portfolio = portfolio
+        self.engine = engine
+        self.trader = trader
+        self.loop = loop
+        self.random_state = random.getstate()
+        self.numpy_random_state = np.random.get_state()
+
+    def restore_random_state(self) -> None:
+        """
+        Put the global random number generators back as they were when saved.
+        """
+        random.setstate(self.random_state)
+        np.random.set_state(self.numpy_random_state)
+
+
+def save_checkpoint(path: str, checkpoint: Checkpoint) -> bool:
+    """
+    Pickle a checkpoint, replacing any earlier one at path.
+
+    The file is written under a temporary name and moved into place, so a
+    crash while saving leaves the previous checkpoint intact.
+
+    :param path: Checkpoint file.
+    :param checkpoint: State to save.
+    :return: False, after logging why, if the state cannot be pickled.
+    """
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            pickle.dump(checkpoint, f, protocol=pickle.HIGHEST_PROTOCOL)
+    except (pickle.PicklingError, TypeError, AttributeError) as e:
+        os.remove(tmp)
+        logging.error(f"Cannot checkpoint the run, the Trader or its state cannot be pickled: {e}")
+        return False
+    os.replace(tmp, path)
+    return True
+
+
+def load_checkpoint(path: str) -> Checkpoint:
+    """
+    Load a checkpoint written by save_checkpoint. The Trader's module must be
+    imported first, see main.import_trader.
+
+    :param path: Checkpoint file.
+    """
+    with open(path, "rb") as f:
+        checkpoint = pickle.load(f)
+    if getattr(checkpoint, "version", None) != CHECKPOINT_VERSION:
+        raise ValueError(f"{path} is not a version {CHECKPOINT_VERSION} checkpoint")
+    return checkpoint
+
+
+def check_resume(checkpoint: Checkpoint, round_data_path: str, trading_algo: str) -> None:
+    """
+    Warn if a checkpoint is resumed with a different round or algo file.
+    """
+    if os.path.abspath(checkpoint.round_data_path) != os.path.abspath(round_data_path):
+        logging.warning(
+            f"Resuming a checkpoint of {checkpoint.round_data_path} on {round_data_path}"
+        )
+    if os.path.abspath(checkpoint.trading_algo) != os.path.abspath(trading_algo):
+        logging.warning(
+            f"Resuming a checkpoint of {checkpoint.trading_algo} with {trading_algo}"
+        )
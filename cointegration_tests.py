@@ -16,7 +16,7 @@ from statsmodels.tsa.stattools import adfuller
 BASE = Path(__file__).resolve().parent
 csv_path = BASE / "Round Data" / "Round_2" / "Round_2.csv"
 
-stock_names, time, df = read_file(str(csv_path))
+stock_names, time, df = read_file(str(csv_path), compact=True)
 
 bond1_df = df[df["product"] == "bond1"].copy()
 bond2_df = df[df["product"] == "bond2"].copy()
@@ -1,17 +1,95 @@
-from typing import Tuple, Dict, List
+import logging
+import os
+from functools import partial
+from typing import Tuple, Dict, List, Optional
+import numpy as np
 import pandas as pd
+from roundcache import read_csv_cached, source_fingerprint, is_fresh
+from roundmmap import round_file_path, write_round_file, open_round_file
+from orderbook import LazyBooks, OrderBook, PriceLadder, TopOfBook
+from bots_functions import BotFlow, top_levels
 
-def read_file(file_path: str) -> Tuple[List[str], int, pd.DataFrame]:
+NARROW_INT_DTYPES = (np.int16, np.int32)
+
+def compact_frame(df: pd.DataFrame) -> Tuple[pd.DataFrame, int]:
+    """
+    Store product as a categorical and narrow integer columns to the smallest
+    of int16/int32 that holds their range.
+
+    A narrowed column only holds its own values: sums and differences of them
+    can overflow, e.g. the mean of two int16 prices of 16384 or more. Widen
+    before doing arithmetic, as RoundData.best_prices does.
+
+    Returns the compacted dataframe and the number of bytes saved.
+
+    :param df: Dataframe containing market or bot data.
+    """
+    before = df.memory_usage(deep=True).sum()
+    columns = {}
+    for col in df.columns:
+        values = df[col]
+        if col == "product":
+            values = values.astype("category")
+        elif pd.api.types.is_integer_dtype(values) and len(values):
+            low, high = values.min(), values.max()
+            for dtype in NARROW_INT_DTYPES:
+                info = np.iinfo(dtype)
+                if info.min <= low and high <= info.max:
+                    values = values.astype(dtype)
+                    break
+        columns[col] = values
+    compacted = pd.DataFrame(columns, index=df.index)
+    return compacted, int(before - compacted.memory_usage(deep=True).sum())
+
+def read_csv(file_path: str, use_cache: bool = True, compact: bool = False) -> pd.DataFrame:
+    """
+    Read a market or bot CSV, optionally through the cache and compacted.
+
+    :param file_path: File path of the CSV.
+    :param use_cache: Read through the binary cache next to the CSV.
+    :param compact: Use categorical products and narrowed integers, see compact_frame.
+    """
+    df = read_csv_cached(file_path) if use_cache else pd.read_csv(file_path)
+    if compact:
+        before = df.memory_usage(deep=True).sum()
+        df, saved = compact_frame(df)
+        logging.info(
+            f"Compact load of {file_path}: {before / 1e6:.2f} MB -> "
+            f"{(before - saved) / 1e6:.2f} MB ({saved / before:.0%} saved)"
+        )
+    return df
+
+def read_file(
+    file_path: str, use_cache: bool = True, compact: bool = False
+) -> Tuple[List[str], int, pd.DataFrame]:
     """
     Create a dataframe of all orders.
 
     :param file_path: File path of CSV containing market data.
+    :param use_cache: Read through the binary cache next to the CSV.
+    :param compact: Use categorical products and narrowed integers, see compact_frame.
     """
-    df = pd.read_csv(file_path)
+    df = read_csv(file_path, use_cache, compact)
     products = df["product"].unique().tolist()
     ticks = df["timestamp"].nunique()
     return products, ticks, df
 
+COMPRESSION_SUFFIXES = (".gz", ".zst", ".bz2", ".xz", ".zip")
+
+def bot_file_path(file_path: str) -> str:
+    """
+    Path of the bot order CSV that accompanies a round's market data CSV.
+    A compression suffix such as .gz is carried over to the bot file.
+
+    :param file_path: File path of CSV containing market data.
+    """
+    compression = ""
+    for suffix in COMPRESSION_SUFFIXES:
+        if file_path.endswith(suffix):
+            file_path, compression = file_path[:-len(suffix)], suffix
+            break
+    return file_path[:-4] + "_bots.csv" + compression
+
 def extract_orders(df: pd.DataFrame, tick: int, product: str) -> Dict[str, Dict[float, int]]:
     """
     Create an orderbook for the specified tick from  dataframe.
@@ -59,3 +137,357 @@ def extract_bot_orders(df: pd.DataFrame, tick: int, product: str) -> Dict[str, D
 
     return {"BUY": bid_orders,
             "SELL": ask_orders}
+
+def count_levels(df: pd.DataFrame) -> int:
+    """
+    Number of price levels per side in a market or bot dataframe.
+
+    :param df: Dataframe with bid_price_N/ask_price_N columns.
+    """
+    levels = 0
+    while f"bid_price_{levels + 1}" in df.columns:
+        levels += 1
+    return levels
+
+def build_book_arrays(
+    df: pd.DataFrame, timestamps: np.ndarray, products: List[str]
+) -> Dict[str, np.ndarray]:
+    """
+    Scatter a market or bot dataframe into dense [tick, product, level] arrays.
+
+    Rows whose timestamp or product is not in the given axes are dropped. If a
+    (timestamp, product) pair appears more than once, the first row wins.
+
+    :param df: Dataframe containing market or bot data.
+    :param timestamps: Sorted timestamps forming the tick axis.
+    :param products: Products forming the product axis.
+    """
+    levels = count_levels(df)
+    df = df.drop_duplicates(subset=["timestamp", "product"], keep="first")
+    tick_idx = np.searchsorted(timestamps, df["timestamp"].to_numpy())
+    tick_idx = np.minimum(tick_idx, len(timestamps) - 1)
+    product_idx = pd.Categorical(df["product"], categories=products).codes
+    keep = (timestamps[tick_idx] == df["timestamp"].to_numpy()) & (product_idx >= 0)
+    tick_idx, product_idx = tick_idx[keep], product_idx[keep]
+
+    shape = (len(timestamps), len(products), levels)
+    arrays = {"present": np.zeros(shape[:2], dtype=bool)}
+    arrays["present"][tick_idx, product_idx] = True
+    for side in ("bid", "ask"):
+        for field in ("price", "volume"):
+            columns = [f"{side}_{field}_{i}" for i in range(1, levels + 1)]
+            values = np.zeros(shape, dtype=np.result_type(*df[columns].dtypes))
+            values[tick_idx, product_idx] = df[columns].to_numpy()[keep]
+            arrays[f"{side}_{field}s"] = values
+    return arrays
+
+def _widen(values: np.ndarray) -> np.ndarray:
+    """
+    values as int64, or float64 if they are floats.
+    """
+    return values.astype(np.promote_types(values.dtype, np.int64), copy=False)
+
+class RoundDataError(ValueError):
+    """
+    Raised when a round's market and bot files do not line up.
+    """
+
+def _first_key(frame: pd.DataFrame) -> str:
+    row = frame.iloc[0]
+    return f"timestamp {row['timestamp']}, {row['product']}"
+
+def _first_cell(mask: np.ndarray, timestamps: np.ndarray, products: List[str]) -> str:
+    row, col = np.argwhere(mask)[0]
+    return f"timestamp {timestamps[row]}, {products[col]}"
+
+def round_problems(
+    df: pd.DataFrame,
+    bot_df: pd.DataFrame,
+    timestamps: np.ndarray,
+    products: List[str],
+    book: Dict[str, np.ndarray],
+    bots: Dict[str, np.ndarray],
+) -> List[str]:
+    """
+    Check a round's market and bot data for duplicate rows, (timestamp, product)
+    keys missing from either file and crossed market books.
+
+    :param df: Dataframe containing market data.
+    :param bot_df: Dataframe containing bot orders.
+    :param timestamps: Tick axis of the arrays.
+    :param products: Product axis of the arrays.
+    :param book: Market arrays from build_book_arrays.
+    :param bots: Bot arrays from build_book_arrays.
+    """
+    problems = []
+    for name, frame in (("market", df), ("bot", bot_df)):
+        duplicated = frame.duplicated(subset=["timestamp", "product"])
+        if duplicated.any():
+            problems.append(
+                f"{duplicated.sum()} duplicate {name} rows (first at {_first_key(frame[duplicated])})"
+            )
+
+    missing = ~book["present"]
+    if missing.any():
+        problems.append(
+            f"{missing.sum()} market rows missing (first at {_first_cell(missing, timestamps, products)})"
+        )
+    missing = book["present"] & ~bots["present"]
+    if missing.any():
+        problems.append(
+            f"{missing.sum()} bot rows missing (first at {_first_cell(missing, timestamps, products)})"
+        )
+    unplaced = bot_df.drop_duplicates(subset=["timestamp", "product"]).shape[0] - bots["present"].sum()
+    extra = unplaced + (bots["present"] & ~book["present"]).sum()
+    if extra:
+        problems.append(f"{extra} bot rows with no matching market row")
+
+    levels = book["bid_prices"].shape[2]
+    if levels:
+        crossed = book["present"] & (book["bid_prices"][:, :, 0] >= book["ask_prices"][:, :, 0])
+        if crossed.any():
+            problems.append(
+                f"{crossed.sum()} crossed market books (first at {_first_cell(crossed, timestamps, products)})"
+            )
+    return problems
+
+class RoundData:
+    """
+    A tick-major store of a round's market and bot order books.
+
+    Prices and volumes are held in dense arrays indexed [tick, product, level],
+    so rebuilding one product's book for one tick costs O(levels) rather than a
+    scan of the whole dataframe.
+    """
+    def __init__(
+        self,
+        products: List[str],
+        timestamps: np.ndarray,
+        book: Dict[str, np.ndarray],
+        bots: Dict[str, np.ndarray],
+    ) -> None:
+        self.products = products
+        self.timestamps = timestamps
+        self.book = book
+        self.bots = bots
+        self.product_index = {product: i for i, product in enumerate(products)}
+        self.tick_rows = {ts: i for i, ts in enumerate(timestamps.tolist())}
+        self._bot_tops = None
+        self._top_of_book = None
+
+    @classmethod
+    def from_frames(
+        cls, df: pd.DataFrame, bot_df: pd.DataFrame, validate: bool = True
+    ) -> "RoundData":
+        """
+        Build the store from market and bot dataframes.
+
+        :param df: Dataframe containing market data.
+        :param bot_df: Dataframe containing bot orders.
+        :param validate: Raise RoundDataError if the files do not line up, see round_problems.
+        """
+        products = df["product"].unique().tolist()
+        timestamps = np.unique(df["timestamp"].to_numpy())
+        book = build_book_arrays(df, timestamps, products)
+        bots = build_book_arrays(bot_df, timestamps, products)
+        if validate:
+            problems = round_problems(df, bot_df, timestamps, products, book, bots)
+            if problems:
+                raise RoundDataError("Invalid round data: " + "; ".join(problems))
+        return cls(products, timestamps, book, bots)
+
+    @classmethod
+    def from_arrays(cls, products: List[str], arrays: Dict[str, np.ndarray]) -> "RoundData":
+        """
+        Rebuild the store from the flat arrays produced by RoundData.to_arrays.
+
+        :param products: Products forming the product axis.
+        :param arrays: Arrays keyed "timestamps", "book/<field>" and "bots/<field>".
+        """
+        book, bots = {}, {}
+        for name, values in arrays.items():
+            group, _, field = name.partition("/")
+            if group == "book":
+                book[field] = values
+            elif group == "bots":
+                bots[field] = values
+        return cls(products, arrays["timestamps"], book, bots)
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """
+        Flatten the store into one array per field.
+        """
+        arrays = {"timestamps": self.timestamps}
+        arrays.update({f"book/{field}": values for field, values in self.book.items()})
+        arrays.update({f"bots/{field}": values for field, values in self.bots.items()})
+        return arrays
+
+    @property
+    def ticks(self) -> int:
+        return len(self.timestamps)
+
+    def best_prices(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Best bid and best ask of the market book, each shaped [tick, product].
+        Their mean is the mid price OrderBook.mid_price marks positions at.
+
+        Prices narrowed by a compact load are widened to int64 (float64 for
+        float prices), so the mid and spread cannot overflow.
+        """
+        bids, asks = self.book["bid_prices"], self.book["ask_prices"]
+        return _widen(bids.max(axis=2)), _widen(asks.min(axis=2))
+
+    def top_of_book(self) -> Dict[str, np.ndarray]:
+        """
+        The TopOfBook fields of the market book for every tick, each shaped
+        [tick, product]. Worked out on first use and kept.
+        """
+        if self._top_of_book is None:
+            book = self.book
+            best_bid, best_ask = self.best_prices()
+            bid_level = book["bid_prices"].argmax(axis=2)[..., None]
+            ask_level = book["ask_prices"].argmin(axis=2)[..., None]
+            self._top_of_book = {
+                "best_bid": best_bid,
+                "best_ask": best_ask,
+                "mid_price": (best_bid + best_ask) / 2,
+                "spread": best_ask - best_bid,
+                "bid_volume": _widen(np.take_along_axis(book["bid_volumes"], bid_level, axis=2)[..., 0]),
+                "ask_volume": _widen(np.take_along_axis(book["ask_volumes"], ask_level, axis=2)[..., 0]),
+            }
+        return self._top_of_book
+
+    def top(self, row: int) -> TopOfBook:
+        """
+        The top of every product's book at one row of the tick axis.
+
+        :param row: Row of the tick axis, see RoundData.tick_rows.
+        """
+        columns = self.top_of_book()
+        return TopOfBook(self.product_index, {field: columns[field][row] for field in TopOfBook.FIELDS})
+
+    def orders(self, row: int, product: str) -> OrderBook:
+        """
+        Create an orderbook for one product at one row of the tick axis.
+
+        :param row: Row of the tick axis, see RoundData.tick_rows.
+        :param product: Product to create orderbook for.
+        """
+        col = self.product_index[product]
+        book = self.book
+        if not book["present"][row, col]:
+            raise IndexError(f"No data for {product} at timestamp {self.timestamps[row]}")
+        return OrderBook.from_ladders(
+            PriceLadder.from_levels(
+                book["bid_prices"][row, col].tolist(), book["bid_volumes"][row, col].tolist(), True
+            ),
+            PriceLadder.from_levels(
+                book["ask_prices"][row, col].tolist(), book["ask_volumes"][row, col].tolist(), False
+            ),
+        )
+
+    def books(self, row: int, products: Optional[List[str]] = None) -> LazyBooks:
+        """
+        The orderbooks at one row of the tick axis, each built on first read.
+
+        :param row: Row of the tick axis, see RoundData.tick_rows.
+        :param products: Products to include. Defaults to every product.
+        """
+        return LazyBooks(self.products if products is None else products, partial(self.orders, row))
+
+    def unchanged_rows(self) -> np.ndarray:
+        """
+        Rows of the tick axis where nothing happens: every product's market
+        book is the same as in the row before and no bot has an order. The
+        first row always counts as changed.
+        """
+        same = np.zeros(len(self.timestamps), dtype=bool)
+        same[1:] = True
+        for values in self.book.values():
+            same[1:] &= (values[1:] == values[:-1]).reshape(len(values) - 1, -1).all(axis=1)
+        for side in ("bid", "ask"):
+            same &= ~(self.bots[f"{side}_volumes"] > 0).reshape(len(self.timestamps), -1).any(axis=1)
+        return same
+
+    def bot_flow(self, row: int) -> BotFlow:
+        """
+        Every product's bot orders at one row of the tick axis.
+
+        The order each bot trades is picked out for the whole round at once
+        the first time this is called.
+
+        :param row: Row of the tick axis, see RoundData.tick_rows.
+        """
+        if self._bot_tops is None:
+            bots = self.bots
+            self._bot_tops = (
+                top_levels(bots["bid_prices"], bots["bid_volumes"])
+                + top_levels(bots["ask_prices"], bots["ask_volumes"])
+            )
+        buy_prices, buy_quantities, sell_prices, sell_quantities = self._bot_tops
+        return BotFlow(
+            self.product_index,
+            buy_prices[row], buy_quantities[row], sell_prices[row], sell_quantities[row],
+        )
+
+def load_round(
+    file_path: str,
+    use_cache: bool = True,
+    mapped: bool = False,
+    compact: bool = False,
+    validate: bool = True,
+) -> RoundData:
+    """
+    Read a round's market and bot CSVs into one aligned RoundData store.
+
+    :param file_path: File path of CSV containing market data.
+    :param use_cache: Read through the binary cache next to each CSV.
+    :param mapped: Back the store with the memory-mapped round file, see load_round_mapped.
+    :param compact: Store prices and volumes in the narrowest integer type that fits.
+    :param validate: Check the two files line up before any tick runs, see round_problems.
+    """
+    if mapped:
+        return load_round_mapped(file_path, compact)
+    products, ticks, df = read_file(file_path, use_cache, compact)
+    bot_df = read_csv(bot_file_path(file_path), use_cache, compact)
+    return RoundData.from_frames(df, bot_df, validate)
+
+def load_round_mapped(file_path: str, compact: bool = False) -> RoundData:
+    """
+    Open a round through the memory-mapped round file next to its CSV.
+
+    The arrays are read-only views of the file, so every process that opens
+    the same round shares one physical copy through the page cache. The file
+    is (re)built from the CSVs when missing or when either CSV has changed,
+    and is only written once the files have passed validation, so opening an
+    existing file skips the checks.
+
+    :param file_path: File path of CSV containing market data.
+    :param compact: Store prices and volumes in the narrowest integer type that fits.
+    """
+    path = round_file_path(file_path)
+    sources = [file_path, bot_file_path(file_path)]
+    if os.path.exists(path):
+        try:
+            meta, arrays = open_round_file(path)
+            fresh = meta.get("compact", False) == compact and all(
+                is_fresh(src, fp) for src, fp in zip(sources, meta["sources"])
+            )
+            if fresh:
+                return RoundData.from_arrays(meta["products"], arrays)
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"Rebuilding unreadable round file {path}: {str(e)}")
+
+    data = load_round(file_path, compact=compact)
+    meta = {
+        "products": data.products,
+        "compact": compact,
+        "sources": [source_fingerprint(src) for src in sources],
+    }
+    try:
+        write_round_file(path, meta, data.to_arrays())
+    except OSError as e:
+        logging.warning(f"Could not write round file {path}: {str(e)}")
+        return data
+    meta, arrays = open_round_file(path)
+    return RoundData.from_arrays(meta["products"], arrays)
@@ -1,40 +1,248 @@
-from typing import Dict, List
+from typing import Callable, Container, Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+from orderbook import TopOfBook
+
+_UNSET = object()
 
 class Listing:
     """
     A class to represent the
     """
+    __slots__ = ("buy_orders", "sell_orders", "product", "_best_bid", "_best_ask")
+
     def __init__(self, orderbook: Dict[str, Dict[int, int]], product: str) -> None:
         self.buy_orders = orderbook["BUY"] #dict of {price: quantity} top is lowest price
         self.sell_orders = orderbook["SELL"] #dict of {price: quantity} top is highest price
         self.product = product
+        self._best_bid = self._best_ask = _UNSET
+
+    @property
+    def best_bid(self) -> Optional[float]:
+        """
+        The first buy price, None if there are no buy orders. Looked up once.
+        """
+        if self._best_bid is _UNSET:
+            self._best_bid = next(iter(self.buy_orders), None)
+        return self._best_bid
+
+    @property
+    def best_ask(self) -> Optional[float]:
+        """
+        The first sell price, None if there are no sell orders. Looked up once.
+        """
+        if self._best_ask is _UNSET:
+            self._best_ask = next(iter(self.sell_orders), None)
+        return self._best_ask
 
 class Order:
     """
     A class to represent an order sent to the matching engine.
+
+    Unfilled quantity rests for the tick the order is sent in. A persistent
+    order keeps resting on later ticks until it fills or is cancelled. The
+    engine sets order_id the first time it accepts the order and matches its
+    own copy, so quantity stays as sent; the copy in state.open_orders shows
+    what is still open.
     """
-    def __init__(self, product: str, price: int, quantity: int):
+    __slots__ = ("product", "price", "quantity", "persistent", "order_id")
+
+    def __init__(self, product: str, price: int, quantity: int, persistent: bool = False):
         self.product = product
         self.price = price
         self.quantity = quantity
+        self.persistent = persistent
+        self.order_id: Optional[int] = None
 
-    def is_valid(self) -> bool:
-        return (isinstance(self.product, str) and self.product and
-                isinstance(self.quantity, int) and self.quantity != 0 and
-                isinstance(self.price, int) and self.price > 0)
+    def is_valid(self, known_products: Optional[Container] = None) -> bool:
+        """
+        Whether PreTradeGate would accept the order: an integer quantity other
+        than zero, a positive whole price, and a known product.
+
+        :param known_products: Products that may be traded, e.g. state.orderbook.
+            If None, any non-empty product name passes.
+        """
+        # Imported here, pretrade imports this module.
+        from pretrade import order_reasons
+        return not order_reasons([self], known_products)[0]
 
     def __str__(self):
         return f"Order(product={self.product}, price={self.price}, quantity={self.quantity})"
 
+class Cancel:
+    """
+    A message asking the matching engine to cancel a persistent order.
+    """
+    __slots__ = ("order_id",)
+
+    def __init__(self, order_id: int):
+        self.order_id = order_id
+
+    def __str__(self):
+        return f"Cancel(order_id={self.order_id})"
+
+class Amend:
+    """
+    A message changing the price and/or remaining quantity of a persistent order.
+    Reducing the quantity keeps the order's place in the queue, any other change
+    sends it to the back.
+    """
+    __slots__ = ("order_id", "price", "quantity")
+
+    def __init__(self, order_id: int, price: Optional[int] = None, quantity: Optional[int] = None):
+        self.order_id = order_id
+        self.price = price
+        self.quantity = quantity
+
+    def __str__(self):
+        return f"Amend(order_id={self.order_id}, price={self.price}, quantity={self.quantity})"
+
+class Wake:
+    """
+    A message telling the engine not to call Trader.run again until a condition holds.
+
+    Until then the engine keeps matching open persistent orders, trading the
+    bots and marking the portfolio, and the fills are in state.fills on the
+    next call. It wakes at the first tick at or after timestamp, or, for
+    product, when its best bid is at or above above or its best ask is at or
+    below below, whichever comes first.
+    """
+    __slots__ = ("timestamp", "product", "above", "below")
+
+    def __init__(self, timestamp: Optional[int] = None, product: Optional[str] = None,
+                 above: Optional[float] = None, below: Optional[float] = None):
+        if product is None and (above is not None or below is not None):
+            raise ValueError("Wake needs a product to compare above and below with")
+        if product is not None and above is None and below is None:
+            raise ValueError("Wake on a product needs an above or below price")
+        if timestamp is None and product is None:
+            raise ValueError("Wake needs a timestamp or a product")
+        self.timestamp = timestamp
+        self.product = product
+        self.above = above
+        self.below = below
+
+    def due(self, state: "State") -> bool:
+        """
+        Whether the engine should call Trader.run on this tick.
+        """
+        if self.timestamp is not None and state.timestamp >= self.timestamp:
+            return True
+        if self.product is None:
+            return False
+        if self.product not in state.orderbook:
+            # No longer subscribed: let the algo decide what to do.
+            return True
+        if state.top is not None:
+            best_bid, best_ask = state.best_bid[self.product], state.best_ask[self.product]
+        else:
+            book = state.orderbook[self.product]
+            best_bid, best_ask = next(iter(book["BUY"]), None), next(iter(book["SELL"]), None)
+        return ((self.above is not None and best_bid is not None and best_bid >= self.above) or
+                (self.below is not None and best_ask is not None and best_ask <= self.below))
+
+    def __str__(self):
+        return f"Wake(timestamp={self.timestamp}, product={self.product}, above={self.above}, below={self.below})"
+
+class Fill:
+    """
+    A trade against one of the trader's orders. quantity is positive for a buy, negative for a sell.
+    """
+    __slots__ = ("order_id", "product", "price", "quantity", "timestamp")
+
+    def __init__(self, order_id: int, product: str, price: int, quantity: int, timestamp: Optional[int]):
+        self.order_id = order_id
+        self.product = product
+        self.price = price
+        self.quantity = quantity
+        self.timestamp = timestamp
+
+    def __str__(self):
+        return f"Fill(order_id={self.order_id}, product={self.product}, price={self.price}, quantity={self.quantity})"
+
+class OrderBatch:
+    """
+    Orders as parallel arrays, which Trader.run can return instead of a list of Order.
+
+    Row i buys quantities[i] (sells if negative) of products[product_ids[i]]
+    at prices[i]. The orders are matched in row order and rest for the tick
+    they are sent in, like Orders that are not persistent.
+    """
+    __slots__ = ("products", "product_ids", "prices", "quantities")
+
+    def __init__(self, products: Sequence[str], product_ids, prices, quantities):
+        """
+        :param products: Product names the ids index, e.g. state.products.
+        :param product_ids: Integer index into products for each order.
+        :param prices: Limit price of each order.
+        :param quantities: Integer quantity of each order, positive to buy, negative to sell.
+        """
+        self.products = list(products)
+        self.product_ids = np.asarray(product_ids)
+        self.prices = np.asarray(prices)
+        self.quantities = np.asarray(quantities)
+        arrays = (self.product_ids, self.prices, self.quantities)
+        if any(a.ndim != 1 for a in arrays) or len(set(map(len, arrays))) != 1:
+            raise ValueError("OrderBatch arrays must be one-dimensional and the same length")
+        if len(self.quantities) == 0:
+            self.product_ids = self.product_ids.astype(np.intp)
+            self.quantities = self.quantities.astype(np.int64)
+        if not np.issubdtype(self.product_ids.dtype, np.integer):
+            raise TypeError("OrderBatch product_ids must be integers")
+        if not np.issubdtype(self.quantities.dtype, np.integer):
+            raise TypeError("OrderBatch quantities must be integers")
+        if not np.issubdtype(self.prices.dtype, np.number):
+            raise TypeError("OrderBatch prices must be numbers")
+
+    def __len__(self) -> int:
+        return len(self.quantities)
+
+    def select(self, rows: np.ndarray) -> "OrderBatch":
+        """
+        The orders in the given rows, e.g. a mask of those that pass PreTradeGate.
+        """
+        return OrderBatch(self.products, self.product_ids[rows], self.prices[rows], self.quantities[rows])
+
+    def product_names(self) -> List[str]:
+        return np.array(self.products, dtype=object)[self.product_ids].tolist()
+
+    def __str__(self):
+        return f"OrderBatch({len(self)} orders)"
+
 class Portfolio:
     """
     A class to represent the trader's current portfolio.
     """
+    __slots__ = ("cash", "quantity", "pnl")
+
     def __init__(self):
         self.cash: float = 0
         self.quantity: Dict[str, int] = {}
         self.pnl: float = 0
 
+    def mark(self, orderbook: Dict, products: List[str]) -> float:
+        """
+        Cash plus each product's position valued at its mid price. Products
+        with no position are skipped, so their books are not read.
+        """
+        pnl = self.cash
+        for product in products:
+            if self.quantity[product] != 0:
+                pnl += self.quantity[product] * orderbook[product].mid_price()
+        return pnl
+
+    def value(self, mid_prices: Mapping[str, float], products: List[str]) -> float:
+        """
+        mark, taking the mid prices from a {product: mid} mapping such as
+        State.mid_price instead of the books.
+        """
+        pnl = self.cash
+        for product in products:
+            if self.quantity[product] != 0:
+                pnl += self.quantity[product] * mid_prices[product]
+        return pnl
+
     def __str__(self):
         return f"Portfolio(cash={self.cash}, quantity={self.quantity}, pnl={self.pnl})"
 
@@ -42,10 +250,45 @@ class State:
     """
     A class to represent the state of the market and the trader's portfolio.
     """
-    def __init__(self, orderbook: Dict[str, Dict[int, int]], positions: Dict[str, int], products: List[str], pos_limit: int):
+    __slots__ = ("orderbook", "positions", "products", "pos_limit", "timestamp", "open_orders", "fills", "pnl", "top")
+
+    def __init__(self, orderbook: Dict[str, Dict[int, int]], positions: Dict[str, int], products: List[str], pos_limit: int,
+                 timestamp: Optional[int] = None, open_orders: Optional[Dict[int, Order]] = None,
+                 fills: Optional[List[Fill]] = None, pnl: Optional[Callable[[], float]] = None,
+                 top: Optional[TopOfBook] = None):
         self.orderbook = orderbook
         self.positions = positions
         self.products = products
         self.pos_limit = pos_limit
+        self.timestamp = timestamp
+        self.open_orders = open_orders if open_orders is not None else {} #persistent orders still open, by order_id
+        self.fills = fills if fills is not None else [] #fills since the last call to run
+        self.pnl = pnl #call state.pnl() for the portfolio marked at the current mid prices
+        self.top = top #TopOfBook for this tick, read through best_bid, best_ask, ... below
+
+    # {product: value} for every product, worked out once per tick by the engine.
+    @property
+    def best_bid(self) -> Optional[Mapping[str, float]]:
+        return None if self.top is None else self.top.best_bid
+
+    @property
+    def best_ask(self) -> Optional[Mapping[str, float]]:
+        return None if self.top is None else self.top.best_ask
+
+    @property
+    def mid_price(self) -> Optional[Mapping[str, float]]:
+        return None if self.top is None else self.top.mid_price
+
+    @property
+    def spread(self) -> Optional[Mapping[str, float]]:
+        return None if self.top is None else self.top.spread
+
+    @property
+    def bid_volume(self) -> Optional[Mapping[str, int]]:
+        return None if self.top is None else self.top.bid_volume
+
+    @property
+    def ask_volume(self) -> Optional[Mapping[str, int]]:
+        return None if self.top is None else self.top.ask_volume
 
 
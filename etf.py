@@ -20,9 +20,8 @@ class Trader:
         self.E2_EXIT = -2
 
     def mid(self, state, p):
-        L = Listing(state.orderbook[p], p)
-        bid = list(L.buy_orders.keys())[0]
-        ask = list(L.sell_orders.keys())[0]
+        bid = state.best_bid[p]
+        ask = state.best_ask[p]
         return (bid + ask) / 2, bid, ask
 
     def run(self, state):
@@ -0,0 +1,179 @@
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from datamodel import Fill
+
+# Who took liquidity in a fill: the algo trading against the book, or a bot
+# trading against the algo's resting orders.
+ALGO = 0
+BOT = 1
+AGGRESSORS = ("algo", "bot")
+
+FILL_DTYPE = np.dtype([
+    ("timestamp", np.int64),
+    ("product", np.int32),
+    ("side", np.int8),  # 1 for a buy, -1 for a sell
+    ("price", np.float64),
+    ("quantity", np.int64),  # always positive, see side
+    ("aggressor", np.uint8),
+    ("order_id", np.int64),
+])
+
+
+class FillLedger:
+    """
+    Append-only blotter of the algo's fills, one row of FILL_DTYPE per fill.
+
+    Rows are written into a preallocated structured array that doubles in
+    size when full, so the blotter holds no Python object per fill and can
+    be queried, marked or exported as arrays after the run.
+    """
+
+    def __init__(self, products: Sequence[str], capacity: int = 1 << 16) -> None:
+        """
+        :param products: All products in the round, in round order. A fill in
+            any other product adds it to the end.
+        :param capacity: Fills to make room for up front.
+        """
+        self.products = list(products)
+        self.product_index: Dict[str, int] = {product: i for i, product in enumerate(self.products)}
+        self._rows = np.zeros(capacity, dtype=FILL_DTYPE)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def fills(self) -> np.ndarray:
+        """
+        The recorded fills, a view of the first len(self) rows.
+        """
+        return self._rows[: self._size]
+
+    def append(
+        self,
+        timestamp: Optional[int],
+        product: str,
+        price: float,
+        quantity: int,
+        aggressor: int = ALGO,
+        order_id: Optional[int] = None,
+    ) -> None:
+        """
+        :param timestamp: Timestamp of the fill.
+        :param product: Product traded.
+        :param price: Fill price.
+        :param quantity: Positive for a buy, negative for a sell.
+        :param aggressor: ALGO or BOT.
+        :param order_id: The algo's order that was filled.
+        """
+        if self._size == len(self._rows):
+            rows = np.zeros(max(1, 2 * len(self._rows)), dtype=FILL_DTYPE)
+            rows[: self._size] = self._rows
+            self._rows = rows
+        product_id = self.product_index.get(product)
+        if product_id is None:
+            product_id = self.product_index[product] = len(self.products)
+            self.products.append(product)
+        self._rows[self._size] = (
+            -1 if timestamp is None else timestamp,
+            product_id,
+            1 if quantity > 0 else -1,
+            price,
+            abs(quantity),
+            aggressor,
+            -1 if order_id is None else order_id,
+        )
+        self._size += 1
+
+    def since(self, start: int) -> List[Fill]:
+        """
+        Fill objects for the rows from start on, e.g. for state.fills.
+
+        :param start: Index of the first row, len(self) when the last were read.
+        """
+        rows = self._rows[start: self._size]
+        products = self.products
+        return [
+            Fill(order_id, products[product], price, side * quantity, None if timestamp < 0 else timestamp)
+            for timestamp, product, side, price, quantity, order_id in zip(
+                rows["timestamp"].tolist(), rows["product"].tolist(), rows["side"].tolist(),
+                rows["price"].tolist(), rows["quantity"].tolist(), rows["order_id"].tolist(),
+            )
+        ]
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        The fills as a dataframe, with product, side and aggressor as categoricals.
+        """
+        fills = self.fills
+        return pd.DataFrame({
+            "timestamp": fills["timestamp"],
+            "product": pd.Categorical.from_codes(fills["product"], self.products),
+            "side": pd.Categorical.from_codes((fills["side"] < 0).astype(np.int8), ["BUY", "SELL"]),
+            "price": fills["price"],
+            "quantity": fills["quantity"],
+            "aggressor": pd.Categorical.from_codes(fills["aggressor"], AGGRESSORS),
+            "order_id": fills["order_id"],
+        })
+
+    def to_arrow(self):
+        """
+        The fills as a pyarrow Table, with product as a dictionary column.
+        Needs the pyarrow package.
+        """
+        import pyarrow as pa
+
+        fills = self.fills
+        columns = {name: pa.array(np.ascontiguousarray(fills[name])) for name in FILL_DTYPE.names}
+        columns["product"] = pa.DictionaryArray.from_arrays(columns["product"], pa.array(self.products))
+        return pa.table(columns)
+
+    def to_parquet(self, file_path: str) -> None:
+        """
+        Write the fills to a Parquet file. Needs the pyarrow package.
+
+        :param file_path: Parquet file to write.
+        """
+        import pyarrow.parquet as pq
+
+        pq.write_table(self.to_arrow(), file_path)
+
+    def curves(self, timestamps: Sequence[int], mids: np.ndarray) -> pd.DataFrame:
+        """
+        Cash, positions and PnL at the end of each timestamp.
+
+        Cash is the running sum of the fills in the order they happened, and
+        PnL adds each product's position marked at its mid price, so the
+        curves match marking the portfolio every tick.
+
+        :param timestamps: Simulated timestamps, ascending.
+        :param mids: Mid prices, shape [len(timestamps), len(products)].
+        :return: Dataframe indexed by timestamp with PnL, Cash and {product}_quantity columns.
+        """
+        timestamps = np.asarray(timestamps)
+        fills = self.fills
+        quantities = fills["quantity"] * fills["side"]
+
+        cash = np.zeros(len(timestamps))
+        if len(self):
+            # Index of the last fill at or before each timestamp, -1 if none yet.
+            last_fill = np.searchsorted(fills["timestamp"], timestamps, side="right") - 1
+            cash_after_fill = np.cumsum(-quantities * fills["price"])
+            cash = np.where(last_fill >= 0, cash_after_fill[np.maximum(last_fill, 0)], 0.0)
+
+        changes = np.zeros((len(timestamps), len(self.products)), dtype=np.int64)
+        np.add.at(changes, (np.searchsorted(timestamps, fills["timestamp"]), fills["product"]), quantities)
+        positions = np.cumsum(changes, axis=0)
+
+        pnl = cash.copy()
+        for col in range(len(self.products)):
+            held = positions[:, col] != 0
+            pnl[held] += positions[held, col] * mids[held, col]
+
+        curves = {"timestamp": timestamps, "PnL": pnl, "Cash": cash}
+        for col, product in enumerate(self.products):
+            curves[f"{product}_quantity"] = positions[:, col]
+        return pd.DataFrame(curves).set_index("timestamp")
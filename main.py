@@ -2,19 +2,28 @@ import logging
 from datetime import datetime
 import argparse
 import sys
-from typing import Dict, List
+from typing import Callable, Dict, Iterator, List, Mapping, Optional, Tuple
 import importlib.util
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import copy
+from functools import partial
+from types import MappingProxyType
 import seaborn as sn
 
-from datamodel import Portfolio, State
-from dataimport import read_file, extract_orders, extract_bot_orders
-from ordermatching import match_order
+from datamodel import Order, Portfolio, State, Wake
+from dataimport import RoundData, load_round
+from roundstream import stream_round, stream_products
+from orderengine import OrderEngine
+from fillledger import FillLedger
+from checkpoint import Checkpoint, check_resume, load_checkpoint, save_checkpoint
+from ordertape import TapePlayer, TapeRecorder
+from orderbook import LazyBooks, ReadOnlyBooks, TopOfBook
 from analytics_vis import Visualiser
-from bots_functions import clean_resting_orders, add_bot_orders
+from bots_functions import BotFlow, add_bot_flow
 
+from collections import Counter
 from itertools import product
 
 # Set up logging
@@ -25,6 +34,7 @@ logging.basicConfig(
 # Constants
 POSITION_LIMIT = 60
 MAX_TICKS = 1000
+TICK_SIZE = 100
 
 
 def import_trader(file_path: str) -> type:
@@ -36,6 +46,8 @@ def import_trader(file_path: str) -> type:
     try:
         spec = importlib.util.spec_from_file_location("trader_module", file_path)
         module = importlib.util.module_from_spec(spec)
+        # Registered so a Trader instance can be pickled into a checkpoint.
+        sys.modules["trader_module"] = module
         spec.loader.exec_module(module)
         return module.Trader
     except Exception as e:
@@ -55,44 +67,130 @@ def initialise_portfolio(products: List[str]) -> Portfolio:
     return portfolio
 
 
-def process_tick(state: State, bot_orders: Dict[str, Dict], algo, portfolio) -> None:
-    # Get orders from the trader
+def active_products(
+    algo,
+    products: List[str],
+    portfolio: Portfolio,
+    previous: List[str],
+    open_orders: Mapping[int, Order] = MappingProxyType({}),
+) -> List[str]:
+    """
+    Products the engine decodes, matches and marks this tick.
+
+    A Trader can set a `subscriptions` list of product names; it is read every
+    tick so it may change during the run. Products it still holds a position
+    in, or has open persistent orders in, stay active until the position is
+    closed and the orders are filled or cancelled. Without subscriptions every
+    product is active.
+
+    :param algo: The Trader instance.
+    :param products: All products in the round, in round order.
+    :param portfolio: The current portfolio.
+    :param previous: Products active on the previous tick.
+    :param open_orders: The engine's open persistent orders.
+    """
+    subscriptions = getattr(algo, "subscriptions", None)
+    if subscriptions is None:
+        return products
+    active = [p for p in subscriptions if p in portfolio.quantity]
+    # Positions only change in active products, so only those can be held.
+    subscribed = set(active)
+    active += [p for p in previous if portfolio.quantity[p] != 0 and p not in subscribed]
+    subscribed.update(active)
+    for order in open_orders.values():
+        if order.product not in subscribed:
+            active.append(order.product)
+            subscribed.add(order.product)
+    return active
+
+
+def process_tick(
+    state: State,
+    bot_orders: BotFlow,
+    algo,
+    portfolio,
+    engine: OrderEngine,
+    mark: bool = True,
+    call_algo: bool = True,
+    tape: Optional[TapeRecorder] = None,
+) -> Optional[Wake]:
+    """
+    Run one tick: call the algo, match its orders, trade the bots and mark the portfolio.
+
+    :param call_algo: False while the algo is asleep: its open orders still
+        trade, but Trader.run is not called.
+    :param tape: If given, what Trader.run returns is recorded on it.
+    :return: The Wake the algo returned, if any.
+    """
+    if not call_algo:
+        _trade_tick(state, bot_orders, None, portfolio, engine, mark)
+        return None
 
-    ob_copy = {
-        product: {side: orders.copy() for side, orders in ob.items()}
-        for product, ob in state.orderbook.items()
-    }
+    # The algo sees read-only views rather than copies of the books and positions.
     publicstate = State(
-        ob_copy, state.positions.copy(), state.products, state.pos_limit
+        ReadOnlyBooks(state.orderbook),
+        MappingProxyType(state.positions),
+        state.products,
+        state.pos_limit,
+        state.timestamp,
+        MappingProxyType(engine.open_orders),
+        engine.take_fills(),
+        partial(portfolio.value, state.mid_price, state.products)
+        if state.top is not None
+        else partial(portfolio.mark, state.orderbook, state.products),
+        state.top,
     )
 
     algo_orders = algo.run(publicstate)
 
-    # Process algo orders
-    algo_resting_orders = {
-        product: {"BUY": {}, "SELL": {}} for product in state.products
-    }
-
-    if algo_orders:
-        algo_resting_orders = match_order(
-            algo_orders, state.orderbook, portfolio, state.pos_limit
+    wake = None
+    if isinstance(algo_orders, list) and any(isinstance(o, Wake) for o in algo_orders):
+        wake = [o for o in algo_orders if isinstance(o, Wake)][-1]
+        algo_orders = [o for o in algo_orders if not isinstance(o, Wake)]
+        if wake.product is not None and wake.product not in state.orderbook:
+            logging.warning(f"Ignoring {wake}: {wake.product} is not in the state")
+            wake = None
+    if tape is not None:
+        # The tape holds what passes the gate and the counts of what does not.
+        before = Counter(engine.gate.rejections)
+        algo_orders = engine.gate.check(algo_orders, state.orderbook)
+        tape.record(state.timestamp, algo_orders, engine.gate.rejections - before)
+
+    _trade_tick(state, bot_orders, algo_orders, portfolio, engine, mark)
+    return wake
+
+
+def _trade_tick(
+    state: State,
+    bot_orders: BotFlow,
+    algo_orders,
+    portfolio: Portfolio,
+    engine: OrderEngine,
+    mark: bool,
+) -> None:
+    # Process algo orders; the engine's PreTradeGate drops any that are invalid.
+    # With no orders nothing rests, and the bots cannot trade with the algo.
+    if algo_orders or engine.open_orders:
+        algo_resting_orders = engine.submit(
+            algo_orders, state.orderbook, portfolio, state.pos_limit, state.timestamp
         )
 
-    # Add bot orders to the orderbook
-    add_bot_orders(
-        bot_orders,
-        state.orderbook,
-        algo_resting_orders,
-        portfolio,
-        state.pos_limit,
-    )
+        # Add bot orders to the orderbook
+        add_bot_flow(
+            bot_orders,
+            state.orderbook,
+            algo_resting_orders,
+            portfolio,
+            state.pos_limit,
+        )
+        engine.settle(algo_resting_orders, state.timestamp)
 
-    portfolio.pnl = portfolio.cash
-    for product in state.products:
-        best_bid = next(iter(state.orderbook[product]["BUY"]))
-        best_ask = next(iter(state.orderbook[product]["SELL"]))
-        midprice = (best_bid + best_ask) / 2
-        portfolio.pnl += portfolio.quantity[product] * midprice
+    if mark:
+        # Fills never move a level's price, so the mids from before matching still hold.
+        if state.top is not None:
+            portfolio.pnl = portfolio.value(state.mid_price, state.products)
+        else:
+            portfolio.pnl = portfolio.mark(state.orderbook, state.products)
 
 
 def update_quantity_data(
@@ -104,100 +202,351 @@ def update_quantity_data(
         quantity_data.loc[tick, f"{product}_quantity"] = portfolio.quantity[product]
 
 
+def record_prices(
+    price_data: Dict[str, List], orderbook: Dict[str, Dict], products: List[str]
+) -> None:
+    """
+    Append each product's best bid, best offer and mid for the analytics plots.
+
+    :param price_data: Price series keyed like the analytics dataframe.
+    :param orderbook: The tick's market orderbook, before any matching.
+    :param products: Products to record, None is recorded for any not in the orderbook.
+    """
+    for product in products:
+        book = orderbook.get(product, {})
+        best_bid = next(iter(book.get("BUY", ())), None)
+        best_ask = next(iter(book.get("SELL", ())), None)
+        if best_bid is None or best_ask is None:
+            mid_price = None
+        else:
+            mid_price = (best_bid + best_ask) / 2
+        price_data.setdefault(product, []).append(mid_price)
+        price_data.setdefault(f"{product}_bid", []).append(best_bid)
+        price_data.setdefault(f"{product}_offer", []).append(best_ask)
+
+
 def prepare_analytics_data(
-    quantity_data: pd.DataFrame, products: List[str], market_data: pd.DataFrame
+    quantity_data: pd.DataFrame, products: List[str], price_data: Dict[str, List]
 ) -> pd.DataFrame:
 
     analytics_df = pd.DataFrame(index=quantity_data.index)
 
-    ticks = quantity_data.index
-
     for product in products:
-        mid_prices = []
-        bid_prices = []
-        offer_prices = []
-        for tick in ticks:
-            try:
-                row = market_data[market_data["timestamp"] == tick * 100]
-                row = row[row["product"] == product]
-                best_bid = row["bid_price_1"].iloc[0]
-                best_ask = row["ask_price_1"].iloc[0]
-                mid_price = (best_bid + best_ask) / 2
-                bid_prices.append(best_bid)
-                offer_prices.append(best_ask)
-                mid_prices.append(mid_price)
-            except:
-                # If data missing, use NaN
-                mid_prices.append(None)
-                bid_prices.append(None)
-                offer_prices.append(None)
-        analytics_df[product] = mid_prices
-        analytics_df[f"{product}_bid"] = bid_prices
-        analytics_df[f"{product}_offer"] = offer_prices
+        analytics_df[product] = price_data[product]
+        analytics_df[f"{product}_bid"] = price_data[f"{product}_bid"]
+        analytics_df[f"{product}_offer"] = price_data[f"{product}_offer"]
     analytics_df["pnl"] = quantity_data["PnL"]
 
     return analytics_df
 
-def main(round_data_path: str, trading_algo: str) -> None:
-    products, ticks, df = read_file(round_data_path)
-    bot_df = pd.read_csv(round_data_path[:-4] + "_bots.csv")
-    market_data = df.copy()
-    portfolio = initialise_portfolio(products)
-    pos_limit = {product: POSITION_LIMIT for product in products}
 
+def top_of_book(
+    data: RoundData, timestamps: List[int]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Best bid, best ask and mid of every product at the given timestamps, each
+    of shape [len(timestamps), len(data.products)].
 
-    # Import the Trader class
-    Trader = import_trader(trading_algo)
-    algo = Trader()
+    :param data: The round that was simulated.
+    :param timestamps: Simulated timestamps, in order.
+    """
+    rows = [data.tick_rows[timestamp] for timestamp in timestamps]
+    top = data.top_of_book()
+    return top["best_bid"][rows], top["best_ask"][rows], top["mid_price"][rows]
 
-    # Create a DataFrame to store the quantity data
-    quantity_data = pd.DataFrame(
-        index=range(1, ticks),
-        columns=[f"{product}_quantity" for product in products] + ["PnL", "Cash"],
-    )
-    start = datetime.now()
 
-    metrics = {"tick": [], "PnL": [], "Cash": []}
+def price_series(data: RoundData, timestamps: List[int], products: List[str]) -> Dict[str, List]:
+    """
+    The price series record_prices would have recorded for a loaded round,
+    read from the round's arrays after the run.
+
+    :param data: The round that was simulated.
+    :param timestamps: Simulated timestamps, in order.
+    :param products: Products to keep price series for.
+    """
+    best_bid, best_ask, mids = top_of_book(data, timestamps)
+    price_data = {}
     for product in products:
-        metrics[f"{product}_quantity"] = []
+        col = data.product_index[product]
+        price_data[product] = mids[:, col].tolist()
+        price_data[f"{product}_bid"] = best_bid[:, col].tolist()
+        price_data[f"{product}_offer"] = best_ask[:, col].tolist()
+    return price_data
 
-    for tick in range(1, MAX_TICKS):
-        if tick % 100 == 0:
-            print(tick)
 
-        orderbook = {product: extract_orders(df, tick, product) for product in products}
-        bot_orders = {
-            product: extract_bot_orders(bot_df, tick, product) for product in products
+def deferred_curves(
+    data: RoundData, ledger: FillLedger, timestamps: List[int], products: List[str]
+) -> Tuple[pd.DataFrame, Dict[str, List]]:
+    """
+    Build the PnL, cash and position curves, and the price series for the
+    plots, from the fill ledger and the round's prices after the run.
+
+    :param data: The round that was simulated.
+    :param ledger: Fills recorded during the run.
+    :param timestamps: Simulated timestamps, in order.
+    :param products: Products to keep position and price series for.
+    :return: The same (quantity_data, price_data) a marked run records tick by tick.
+    """
+    _, _, mids = top_of_book(data, timestamps)
+    curves = ledger.curves(timestamps, mids)
+    quantity_data = curves[["PnL", "Cash"] + [f"{product}_quantity" for product in products]]
+    return quantity_data, price_series(data, timestamps, products)
+
+
+def round_ticks(
+    data: RoundData,
+    max_ticks: int,
+    active: Optional[List[str]] = None,
+    skip_unchanged: bool = False,
+    after: Optional[int] = None,
+) -> Iterator[Tuple[int, Dict, TopOfBook, BotFlow]]:
+    """
+    Yield (timestamp, orderbook, top, bot_orders) for each timestamp of a loaded
+    round, in the order they appear in the data. The orderbook is a LazyBooks,
+    so only the products that are read that tick are built, and top reads the
+    round's precomputed top-of-book arrays.
+
+    :param data: The round's market and bot data.
+    :param max_ticks: Timestamps before max_ticks * TICK_SIZE are yielded.
+    :param active: Products to decode, read afresh each tick so the caller can
+        update it in place. Defaults to every product.
+    :param skip_unchanged: Jump over timestamps where the market book is the
+        same as at the one before and no bot trades, see RoundData.unchanged_rows.
+    :param after: Only yield timestamps after this one, e.g. a checkpoint's.
+    """
+    products = data.products if active is None else active
+    end = int(np.searchsorted(data.timestamps, max_ticks * TICK_SIZE))
+    first = 0 if after is None else int(np.searchsorted(data.timestamps, after, side="right"))
+    rows = range(first, end)
+    if skip_unchanged:
+        rows = (first + np.flatnonzero(~data.unchanged_rows()[first:end])).tolist()
+    timestamps = data.timestamps.tolist()
+    for row in rows:
+        orderbook = data.books(row, products)
+        yield timestamps[row], orderbook, data.top(row), data.bot_flow(row)
+
+
+def streamed_ticks(
+    round_data_path: str,
+    max_ticks: int,
+    active: Optional[List[str]] = None,
+    after: Optional[int] = None,
+) -> Iterator[Tuple[int, Dict, TopOfBook, BotFlow]]:
+    """
+    Yield (timestamp, orderbook, top, bot_orders) while streaming the round from disk.
+
+    :param round_data_path: File path of CSV containing market data.
+    :param max_ticks: Timestamps before max_ticks * TICK_SIZE are yielded.
+    :param active: Products to decode, as for round_ticks. Defaults to every product.
+    :param after: Only yield timestamps after this one, as for round_ticks.
+    """
+    for timestamp, orderbook, bot_orders in stream_round(round_data_path, active=active):
+        if timestamp >= max_ticks * TICK_SIZE:
+            break
+        if after is not None and timestamp <= after:
+            continue
+        yield timestamp, orderbook, TopOfBook.from_books(orderbook), BotFlow.from_orders(bot_orders)
+
+
+def main(
+    round_data_path: str,
+    trading_algo: str,
+    mapped: bool = False,
+    stream: bool = False,
+    max_ticks: int = MAX_TICKS,
+    plot: bool = True,
+    deferred: bool = False,
+    blotter_path: Optional[str] = None,
+    skip_unchanged: bool = False,
+    checkpoint_path: Optional[str] = None,
+    checkpoint_every: int = 0,
+    resume: Optional[str] = None,
+    configure: Optional[Callable] = None,
+    record_path: Optional[str] = None,
+    replay_path: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Simulate a round with a trading algo.
+
+    :param checkpoint_path: Save a checkpoint here every checkpoint_every ticks
+        and at the end of the run, replacing the previous one.
+    :param checkpoint_every: Ticks between checkpoints, 0 for only at the end.
+    :param resume: Carry on from this checkpoint instead of the start of the
+        round. The checkpoint is only read, so several runs can fork from it.
+    :param configure: Called with the Trader before the first tick simulated,
+        e.g. to set the parameters of a fork.
+    :param record_path: Record what Trader.run returns each tick to this order tape.
+    :param replay_path: Play this order tape through the engine instead of
+        running trading_algo, which is not imported.
+    """
+    if deferred and stream:
+        raise ValueError("Deferred marking needs the round loaded, it cannot be streamed")
+    if skip_unchanged and stream:
+        raise ValueError("Unchanged ticks are found from the loaded round, it cannot be streamed")
+
+    if replay_path and (resume or record_path or checkpoint_path):
+        raise ValueError("A replay cannot be checkpointed, resumed or recorded")
+
+    checkpoint = None
+    if replay_path:
+        # The player stands in for the Trader, with its recorded subscriptions.
+        algo = TapePlayer(replay_path)
+    elif resume:
+        import_trader(trading_algo)
+        checkpoint = load_checkpoint(resume)
+        check_resume(checkpoint, round_data_path, trading_algo)
+        if checkpoint.loop["deferred"] != deferred:
+            raise ValueError("A checkpoint must be resumed with the same deferred setting it was saved with")
+        checkpoint.restore_random_state()
+        algo = checkpoint.trader
+    else:
+        # Import the Trader class
+        Trader = import_trader(trading_algo)
+        algo = Trader()
+    if configure is not None:
+        configure(algo)
+    after = None if checkpoint is None else checkpoint.timestamp
+
+    active = []
+    if stream:
+        # Products are taken from the first tick of the stream.
+        products = stream_products(round_data_path)
+        tick_source = streamed_ticks(round_data_path, max_ticks, active, after)
+    else:
+        data = load_round(round_data_path, mapped=mapped)
+        products = data.products
+        tick_source = round_ticks(data, max_ticks, active, skip_unchanged, after)
+    pos_limit = {product: POSITION_LIMIT for product in products}
+
+    if checkpoint is not None:
+        portfolio, engine = checkpoint.portfolio, checkpoint.engine
+        loop = checkpoint.loop
+        active[:] = loop["active"]
+        plotted, metrics, price_data = loop["plotted"], loop["metrics"], loop["price_data"]
+        wake, asleep_ticks = loop["wake"], loop["asleep_ticks"]
+        books_built, books_offered = loop["books_built"], loop["books_offered"]
+        tape = loop["tape"] if record_path else None
+    else:
+        portfolio = initialise_portfolio(products)
+        # Every fill goes in the ledger; when deferred, the portfolio is only marked from it at the end.
+        engine = OrderEngine(FillLedger(products))
+
+        active[:] = active_products(algo, products, portfolio, [])
+        unknown = set(getattr(algo, "subscriptions", None) or ()) - set(products)
+        if unknown:
+            logging.warning(f"Ignoring subscriptions to unknown products: {sorted(unknown)}")
+        plotted = list(active)
+
+        metrics = {"timestamp": [], "PnL": [], "Cash": []}
+        for product in plotted:
+            metrics[f"{product}_quantity"] = []
+        price_data = {}
+        wake, asleep_ticks = None, 0
+        # Product -> ticks its book was built on, and how many could have been.
+        books_built, books_offered = Counter(), 0
+        tape = None
+    if record_path and tape is None:
+        tape = TapeRecorder(products)
+        tape.record_subscriptions(None, getattr(algo, "subscriptions", None))
+    ledger = engine.ledger
+
+    def save(timestamp: int) -> bool:
+        loop = {
+            "deferred": deferred, "active": list(active), "plotted": plotted, "metrics": metrics,
+            "price_data": price_data, "wake": wake, "asleep_ticks": asleep_ticks,
+            "books_built": books_built, "books_offered": books_offered, "tape": tape,
         }
-        state = State(orderbook, portfolio.quantity, products, pos_limit)
+        return save_checkpoint(
+            checkpoint_path,
+            Checkpoint(round_data_path, trading_algo, timestamp, portfolio, engine, algo, loop),
+        )
+
+    start = datetime.now()
+    ticks_run = 0
+
+    for timestamp, orderbook, top, bot_orders in tick_source:
+        if len(metrics["timestamp"]) % 100 == 0:
+            print(timestamp)
+
+        if stream:
+            record_prices(price_data, orderbook, plotted)
+        state = State(orderbook, portfolio.quantity, list(active), pos_limit, timestamp, top=top)
         # try:
-        process_tick(state, bot_orders, algo, portfolio)
-        metrics["tick"].append(tick)
-        metrics["PnL"].append(portfolio.pnl)
-        metrics["Cash"].append(portfolio.cash)
-        for product in products:
-            metrics[f"{product}_quantity"].append(portfolio.quantity[product])
+        if replay_path:
+            engine.gate.rejections.update(algo.rejections(timestamp))
+            _trade_tick(state, bot_orders, algo.messages(timestamp), portfolio, engine, not deferred)
+        else:
+            asleep = wake is not None and not wake.due(state)
+            asleep_ticks += asleep
+            hint = process_tick(state, bot_orders, algo, portfolio, engine, not deferred, not asleep, tape)
+            if not asleep:
+                wake = hint
+        if isinstance(orderbook, LazyBooks):
+            books_built.update(orderbook.built())
+            books_offered += len(orderbook)
+        metrics["timestamp"].append(timestamp)
+        if not deferred:
+            metrics["PnL"].append(portfolio.pnl)
+            metrics["Cash"].append(portfolio.cash)
+            for product in plotted:
+                metrics[f"{product}_quantity"].append(portfolio.quantity[product])
+        if replay_path:
+            algo.advance(timestamp)
+        active[:] = active_products(algo, products, portfolio, active, engine.open_orders)
+        if tape is not None:
+            tape.record_subscriptions(timestamp, getattr(algo, "subscriptions", None))
 
         # except:
         #     break
+        ticks_run += 1
+        if checkpoint_path and checkpoint_every and ticks_run % checkpoint_every == 0:
+            if not save(timestamp):
+                checkpoint_path = None
 
     end = datetime.now()
-    quantity_data = pd.DataFrame(metrics).set_index("tick")
+    if checkpoint_path and ticks_run:
+        save(timestamp)
+    if deferred:
+        quantity_data, price_data = deferred_curves(data, ledger, metrics["timestamp"], plotted)
+        if len(quantity_data):
+            portfolio.pnl = quantity_data["PnL"].iloc[-1]
+    else:
+        quantity_data = pd.DataFrame(metrics).set_index("timestamp")
+        if not stream:
+            price_data = price_series(data, metrics["timestamp"], plotted)
+    if books_offered:
+        logging.info(
+            f"Built {sum(books_built.values())} of {books_offered} product orderbooks, "
+            f"{sum(p not in books_built for p in products)} products were never read"
+        )
 
-    print(f"Time per tick: {(end-start)/MAX_TICKS}")
+    print(f"Time per tick: {(end-start)/max(1, ticks_run)}")
 
     # Portfolio summary
     print("\n=== Final Portfolio State ===")
     print(f"PnL: {portfolio.pnl:.2f}")
-
-    analytics_df = prepare_analytics_data(quantity_data, products, market_data)
+    print(f"Fills: {len(ledger)}")
+    if asleep_ticks:
+        print(f"Trader.run skipped while asleep: {asleep_ticks} ticks")
+    if engine.gate.rejections:
+        print(f"Rejected orders: {dict(engine.gate.rejections)}")
+    if blotter_path:
+        ledger.to_parquet(blotter_path)
+    if tape is not None:
+        tape.save(record_path, round_data_path, trading_algo)
+
+    if not plot:
+        return quantity_data
+
+    analytics_df = prepare_analytics_data(quantity_data, plotted, price_data)
     positions_df = pd.DataFrame(index=quantity_data.index)
-    for product in products:
+    for product in plotted:
         positions_df[product] = quantity_data[f"{product}_quantity"]
     vis = Visualiser(
-        dataframe=analytics_df, products=products, volume_data=positions_df
+        dataframe=analytics_df, products=plotted, volume_data=positions_df
     )
     vis.display_visualisation()
+    return quantity_data
 
 
 if __name__ == "__main__":
@@ -210,9 +559,76 @@ if __name__ == "__main__":
     parser.add_argument(
         "--algo", default="algorithm_5.py", help="Trading alngorithm path"
     )
+    parser.add_argument(
+        "--mmap",
+        action="store_true",
+        help="Read the round through its memory-mapped round file",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream the round from disk in chunks instead of loading it (accepts .csv.gz/.csv.zst)",
+    )
+    parser.add_argument(
+        "--max-ticks",
+        type=int,
+        default=MAX_TICKS,
+        help="Simulate timestamps before max-ticks * 100",
+    )
+    parser.add_argument(
+        "--no-plot", action="store_true", help="Skip the analytics plots"
+    )
+    parser.add_argument(
+        "--deferred",
+        action="store_true",
+        help="Only record fills while running and mark the portfolio once at the end",
+    )
+    parser.add_argument(
+        "--blotter", default=None, help="Write every fill to this Parquet file (needs pyarrow)"
+    )
+    parser.add_argument(
+        "--skip-unchanged",
+        action="store_true",
+        help="Skip timestamps where the market book has not changed and no bot trades",
+    )
+    parser.add_argument(
+        "--checkpoint", default=None, help="Save a checkpoint of the run to this file"
+    )
+    parser.add_argument(
+        "--checkpoint-every",
+        type=int,
+        default=0,
+        help="Ticks between checkpoints (default: only at the end of the run)",
+    )
+    parser.add_argument(
+        "--resume", default=None, help="Carry on from this checkpoint file"
+    )
+    parser.add_argument(
+        "--record", default=None, help="Record the algo's orders each tick to this order tape (.npz)"
+    )
+    parser.add_argument(
+        "--replay",
+        default=None,
+        help="Play an order tape through the engine instead of running --algo",
+    )
     args = parser.parse_args()
 
-    main(args.round, args.algo)
+    main(
+        args.round,
+        args.algo,
+        args.mmap,
+        args.stream,
+        args.max_ticks,
+        not args.no_plot,
+        args.deferred,
+        args.blotter,
+        args.skip_unchanged,
+        args.checkpoint,
+        args.checkpoint_every,
+        args.resume,
+        record_path=args.record,
+        replay_path=args.replay,
+    )
     
 
 
@@ -1,10 +1,15 @@
-import logging
+import argparse
 import importlib.util
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import product
+from typing import Dict, List, Optional
 import pandas as pd
 from datamodel import Portfolio, State
-from dataimport import read_file, extract_orders, extract_bot_orders
-from ordermatching import match_order
-from bots_functions import add_bot_orders
+from dataimport import RoundData, load_round
+from fillledger import FillLedger
+from orderengine import OrderEngine
+from bots_functions import add_bot_flow
 from datetime import datetime
 
 # -----------------------
@@ -18,11 +23,14 @@ EXIT_Z_VALUES  = [0.15, 0.2, 0.3]
 # UTILITY FUNCTIONS
 # -----------------------
 
-def import_trader(file_path: str) -> type:
+def import_algo(file_path: str):
     spec = importlib.util.spec_from_file_location("trader_module", file_path)
     module = importlib.util.module_from_spec(spec)
     spec.loader.exec_module(module)
-    return module.Trader
+    return module
+
+def import_trader(file_path: str) -> type:
+    return import_algo(file_path).Trader
 
 def init_portfolio(products):
     portfolio = Portfolio()
@@ -30,7 +38,7 @@ def init_portfolio(products):
         portfolio.quantity[p] = 0
     return portfolio
 
-def run_sim(products, ticks, df, bot_df, TraderClass, params, target_pair):
+def run_sim(data: RoundData, TraderClass, params, target_pair):
     entry_z, exit_z = params
 
     algo = TraderClass(
@@ -41,26 +49,31 @@ def run_sim(products, ticks, df, bot_df, TraderClass, params, target_pair):
     # Limit Trader to 1 pair
     algo.pairs = [target_pair]
 
+    products = data.products
     portfolio = init_portfolio(products)
     pos_limit = {p: 60 for p in products}
-
-    for tick in range(1, ticks):
-        orderbook = {p: extract_orders(df, tick, p) for p in products}
-        bot_orders = {p: extract_bot_orders(bot_df, tick, p) for p in products}
-
-        state = State(orderbook, portfolio.quantity, products, pos_limit)
+    # The same engine as main.py, so orders the gate rejects there are rejected here too.
+    engine = OrderEngine(FillLedger(products))
+    timestamps = data.timestamps.tolist()
+
+    for row in range(data.ticks):
+        orderbook = data.books(row)
+        bot_orders = data.bot_flow(row)
+        timestamp = timestamps[row]
+
+        state = State(
+            orderbook, portfolio.quantity, products, pos_limit, timestamp,
+            engine.open_orders, engine.take_fills(), top=data.top(row),
+        )
         algo_orders = algo.run(state)
 
-        resting = match_order(algo_orders, state.orderbook, portfolio, pos_limit)
-        add_bot_orders(bot_orders, state.orderbook, resting, portfolio, pos_limit)
+        if algo_orders or engine.open_orders:
+            resting = engine.submit(algo_orders, state.orderbook, portfolio, pos_limit, timestamp)
+            add_bot_flow(bot_orders, state.orderbook, resting, portfolio, pos_limit)
+            engine.settle(resting, timestamp)
 
         # update pnl
-        portfolio.pnl = portfolio.cash
-        for p in products:
-            best_bid = next(iter(state.orderbook[p]["BUY"]))
-            best_ask = next(iter(state.orderbook[p]["SELL"]))
-            mid = (best_bid + best_ask) / 2
-            portfolio.pnl += portfolio.quantity[p] * mid
+        portfolio.pnl = portfolio.value(state.mid_price, products)
 
     return portfolio.pnl
 
@@ -69,35 +82,63 @@ def run_sim(products, ticks, df, bot_df, TraderClass, params, target_pair):
 # OPTIMISATION ENGINE
 # -----------------------
 
-def optimise(round_path, algo_path):
-    products, ticks, df = read_file(round_path)
-    bot_df = pd.read_csv(round_path[:-4] + "_bots.csv")
-
-    TraderClass = import_trader(algo_path)
-
-    from algorithm_5 import PAIRS   # use your pair list
-
-    results = []
-
-    print("\n=== Running optimisation ===")
-
-    for pair in PAIRS:
-        print(f"\nTesting pair: {pair}")
-
-        for entry_z in ENTRY_Z_VALUES:
-            for exit_z in EXIT_Z_VALUES:
-
-                params = (entry_z, exit_z)
-                pnl = run_sim(products, ticks, df, bot_df, TraderClass, params, pair)
-
-                results.append({
-                    "pair": pair,
-                    "entry_z": entry_z,
-                    "exit_z": exit_z,
-                    "PnL": pnl
-                })
-
-                print(f"  entry_z={entry_z:.2f}, exit_z={exit_z:.2f} → PnL={pnl:.2f}")
+# Set in each worker process by _init_worker, so tasks only carry their grid point.
+_worker: Dict = {}
+
+def _init_worker(round_path: str, algo_path: str) -> None:
+    # The round file is memory-mapped, so every worker shares one copy of the data.
+    _worker["data"] = load_round(round_path, mapped=True)
+    _worker["trader"] = import_trader(algo_path)
+
+def _run_grid_point(pair, entry_z: float, exit_z: float) -> Dict:
+    pnl = run_sim(_worker["data"], _worker["trader"], (entry_z, exit_z), pair)
+    return {"pair": pair, "entry_z": entry_z, "exit_z": exit_z, "PnL": pnl}
+
+def optimise(
+    round_path: str,
+    algo_path: str,
+    workers: Optional[int] = None,
+    out_path: str = "pair_param_results.csv",
+) -> pd.DataFrame:
+    """
+    Backtest every pair x entry_z x exit_z grid point, in parallel.
+
+    :param round_path: File path of the round's market CSV.
+    :param algo_path: Trading algo with a PAIRS list and a Trader(entry_z, exit_z).
+    :param workers: Worker processes, defaults to the core count. 1 runs in this process.
+    :param out_path: CSV the results are written to.
+    """
+    # Builds the memory-mapped round file once, before the workers open it.
+    data = load_round(round_path, mapped=True)
+
+    PAIRS = import_algo(algo_path).PAIRS   # use your pair list
+    grid = list(product(PAIRS, ENTRY_Z_VALUES, EXIT_Z_VALUES))
+    workers = min(workers or os.cpu_count(), len(grid))
+
+    results: List[Dict] = []
+
+    print(f"\n=== Running optimisation: {len(grid)} backtests on {workers} workers ===")
+    start = datetime.now()
+
+    def report(row: Dict) -> None:
+        results.append(row)
+        print(f"  {row['pair']}: entry_z={row['entry_z']:.2f}, exit_z={row['exit_z']:.2f} → PnL={row['PnL']:.2f}")
+
+    if workers <= 1:
+        TraderClass = import_trader(algo_path)
+        for pair, entry_z, exit_z in grid:
+            pnl = run_sim(data, TraderClass, (entry_z, exit_z), pair)
+            report({"pair": pair, "entry_z": entry_z, "exit_z": exit_z, "PnL": pnl})
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(round_path, algo_path)
+        ) as pool:
+            futures = [pool.submit(_run_grid_point, *point) for point in grid]
+            # Results are printed as they finish, not in grid order.
+            for future in as_completed(futures):
+                report(future.result())
+
+    print(f"Finished in {(datetime.now() - start).total_seconds():.1f}s")
 
     # Output sorted results
     print("\n=== BEST RESULTS ===")
@@ -105,8 +146,9 @@ def optimise(round_path, algo_path):
     df_res = df_res.sort_values("PnL", ascending=False)
     print(df_res)
 
-    df_res.to_csv("pair_param_results.csv", index=False)
-    print("\nSaved results to pair_param_results.csv")
+    df_res.to_csv(out_path, index=False)
+    print(f"\nSaved results to {out_path}")
+    return df_res
 
 
 # -----------------------
@@ -114,4 +156,11 @@ def optimise(round_path, algo_path):
 # -----------------------
 
 if __name__ == "__main__":
-    optimise("Round Data/Round_4/Round_4.csv", "algo_5_test.py")
+    parser = argparse.ArgumentParser(description="Grid search a pairs algo's entry and exit thresholds.")
+    parser.add_argument("--round", default="Round Data/Round_4/Round_4.csv", help="Main data file path")
+    parser.add_argument("--algo", default="algo_5_test.py", help="Trading algorithm path")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: core count)")
+    parser.add_argument("--out", default="pair_param_results.csv", help="Results CSV")
+    args = parser.parse_args()
+
+    optimise(args.round, args.algo, args.workers, args.out)
@@ -0,0 +1,431 @@
+from bisect import bisect_left
+from collections.abc import Mapping
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+
+
+class PriceLadder(Mapping):
+    """
+    One side of an order book, with price levels kept sorted best-first.
+
+    Reads like the {price: quantity} dict it replaces: iteration yields prices
+    best-first, so next(iter(ladder)) is the best price. Levels are held in
+    parallel lists, giving O(1) access to the best level, O(log n) lookup and
+    insertion by bisection, and in-place fills by index.
+    """
+
+    __slots__ = ("descending", "_keys", "_prices", "_volumes")
+
+    def __init__(self, levels: Optional[Dict[int, int]] = None, descending: bool = False) -> None:
+        """
+        :param levels: Initial {price: quantity} levels, in any order.
+        :param descending: True for bids (best is highest), False for asks.
+        """
+        self.descending = descending
+        # Sort keys are -price for bids so both sides bisect in ascending order.
+        self._keys: List[float] = []
+        self._prices: List[float] = []
+        self._volumes: List[int] = []
+        if levels:
+            for price in sorted(levels, reverse=descending):
+                self._keys.append(-price if descending else price)
+                self._prices.append(price)
+                self._volumes.append(levels[price])
+
+    @classmethod
+    def from_levels(cls, prices: List[float], volumes: List[int], descending: bool) -> "PriceLadder":
+        """
+        Build a ladder from parallel level lists, such as a row of market data.
+
+        Lists already sorted best-first are taken as they are; otherwise they
+        are merged like dict(zip(prices, volumes)).
+
+        :param prices: Level prices.
+        :param volumes: Level quantities.
+        :param descending: True for bids, False for asks.
+        """
+        keys = [-price for price in prices] if descending else list(prices)
+        if keys == sorted(keys) and len(set(keys)) == len(keys):
+            return cls._from_lists(descending, keys, list(prices), list(volumes))
+        return cls(dict(zip(prices, volumes)), descending)
+
+    @classmethod
+    def _from_lists(
+        cls, descending: bool, keys: List[float], prices: List[float], volumes: List[int]
+    ) -> "PriceLadder":
+        ladder = cls.__new__(cls)
+        ladder.descending = descending
+        ladder._keys = keys
+        ladder._prices = prices
+        ladder._volumes = volumes
+        return ladder
+
+    def _find(self, price: float) -> int:
+        key = -price if self.descending else price
+        i = bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            return i
+        return -1
+
+    def __getitem__(self, price: float) -> int:
+        i = self._find(price)
+        if i < 0:
+            raise KeyError(price)
+        return self._volumes[i]
+
+    def __contains__(self, price) -> bool:
+        return self._find(price) >= 0
+
+    def __iter__(self) -> Iterator[float]:
+        return iter(self._prices)
+
+    def __len__(self) -> int:
+        return len(self._prices)
+
+    def __setitem__(self, price: float, quantity: int) -> None:
+        key = -price if self.descending else price
+        i = bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            self._volumes[i] = quantity
+        else:
+            self._keys.insert(i, key)
+            self._prices.insert(i, price)
+            self._volumes.insert(i, quantity)
+
+    def __repr__(self) -> str:
+        return f"PriceLadder({dict(self.items())})"
+
+    # Mapping builds keys/values/items from __getitem__; the lists are already here.
+    def keys(self) -> List[float]:
+        return self._prices.copy()
+
+    def values(self) -> List[int]:
+        return self._volumes.copy()
+
+    def items(self) -> List[tuple]:
+        return list(zip(self._prices, self._volumes))
+
+    def get(self, price, default=None):
+        i = self._find(price)
+        return default if i < 0 else self._volumes[i]
+
+    def add(self, price: float, quantity: int) -> None:
+        """
+        Add quantity at a price, creating the level if needed.
+
+        :param price: Price of the level.
+        :param quantity: Quantity to add.
+        """
+        i = self._find(price)
+        if i < 0:
+            self[price] = quantity
+        else:
+            self._volumes[i] += quantity
+
+    def decrement(self, price: float, quantity: int) -> None:
+        """
+        Take quantity from an existing level. Empty levels are kept until
+        remove_empty is called.
+
+        :param price: Price of the level.
+        :param quantity: Quantity to remove.
+        """
+        i = self._find(price)
+        if i < 0:
+            raise KeyError(price)
+        self._volumes[i] -= quantity
+
+    def price_at(self, i: int) -> float:
+        return self._prices[i]
+
+    def volume_at(self, i: int) -> int:
+        return self._volumes[i]
+
+    def fill_at(self, i: int, quantity: int) -> None:
+        """
+        Take quantity from the i-th best level.
+        """
+        self._volumes[i] -= quantity
+
+    def best_price(self) -> Optional[float]:
+        """
+        Price of the top level, whether or not it has volume left.
+        """
+        return self._prices[0] if self._prices else None
+
+    def remove_empty(self) -> None:
+        """
+        Drop levels with no quantity left.
+        """
+        if 0 not in self._volumes:
+            return
+        keep = [i for i, volume in enumerate(self._volumes) if volume != 0]
+        self._keys = [self._keys[i] for i in keep]
+        self._prices = [self._prices[i] for i in keep]
+        self._volumes = [self._volumes[i] for i in keep]
+
+    def copy(self) -> "PriceLadder":
+        return PriceLadder._from_lists(
+            self.descending, self._keys.copy(), self._prices.copy(), self._volumes.copy()
+        )
+
+
+class OrderBook(Mapping):
+    """
+    A product's order book: a bid ladder under "BUY" and an ask ladder under "SELL".
+
+    Supports the same reads as the {"BUY": {...}, "SELL": {...}} dicts in
+    State.orderbook.
+    """
+
+    __slots__ = ("bids", "asks")
+
+    def __init__(self, bids: Optional[Dict[int, int]] = None, asks: Optional[Dict[int, int]] = None) -> None:
+        """
+        :param bids: Initial {price: quantity} buy levels.
+        :param asks: Initial {price: quantity} sell levels.
+        """
+        self.bids = PriceLadder(bids, descending=True)
+        self.asks = PriceLadder(asks, descending=False)
+
+    def __getitem__(self, side: str) -> PriceLadder:
+        if side == "BUY":
+            return self.bids
+        if side == "SELL":
+            return self.asks
+        raise KeyError(side)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(("BUY", "SELL"))
+
+    def __len__(self) -> int:
+        return 2
+
+    def __repr__(self) -> str:
+        return f"OrderBook(BUY={dict(self.bids.items())}, SELL={dict(self.asks.items())})"
+
+    @classmethod
+    def from_ladders(cls, bids: PriceLadder, asks: PriceLadder) -> "OrderBook":
+        book = cls.__new__(cls)
+        book.bids = bids
+        book.asks = asks
+        return book
+
+    def best_bid(self) -> Optional[float]:
+        return self.bids.best_price()
+
+    def best_ask(self) -> Optional[float]:
+        return self.asks.best_price()
+
+    def mid_price(self) -> float:
+        """
+        Mid of the top bid and ask levels, used to mark positions.
+        """
+        return (self.bids.best_price() + self.asks.best_price()) / 2
+
+    def remove_empty(self) -> None:
+        self.bids.remove_empty()
+        self.asks.remove_empty()
+
+    def copy(self) -> "OrderBook":
+        return OrderBook.from_ladders(self.bids.copy(), self.asks.copy())
+
+
+class LazyBooks(Mapping):
+    """
+    {product: OrderBook} mapping that builds each product's book the first
+    time it is looked up.
+
+    Iterating and membership tests only use the product names, so a tick
+    where the algo and the engine read a few products only pays for those.
+    The books built so far are kept, in the order they were first read, and
+    the engine's fills are made to them like to any other book.
+    """
+
+    __slots__ = ("_products", "_build", "_books")
+
+    def __init__(self, products: Sequence[str], build: Callable[[str], OrderBook]) -> None:
+        """
+        :param products: Products in the mapping, in iteration order.
+        :param build: Builds the book for a product.
+        """
+        self._products = products
+        self._build = build
+        self._books: Dict[str, OrderBook] = {}
+
+    def __getitem__(self, product: str) -> OrderBook:
+        book = self._books.get(product)
+        if book is None:
+            if product not in self._products:
+                raise KeyError(product)
+            book = self._books[product] = self._build(product)
+        return book
+
+    def __contains__(self, product) -> bool:
+        return product in self._products
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._products)
+
+    def __len__(self) -> int:
+        return len(self._products)
+
+    def __repr__(self) -> str:
+        return f"LazyBooks({list(self._products)}, built={list(self._books)})"
+
+    def built(self) -> List[str]:
+        """
+        Products whose book has been built, in the order they were first read.
+        """
+        return list(self._books)
+
+
+class TopColumn(Mapping):
+    """
+    Read-only {product: value} view of one top-of-book field at one tick,
+    reading from a row of values indexed by product.
+    """
+
+    __slots__ = ("_index", "_values")
+
+    def __init__(self, index: Dict[str, int], values) -> None:
+        """
+        :param index: Product -> position in values.
+        :param values: One value per product, e.g. a row of a [tick, product] array.
+        """
+        self._index = index
+        self._values = values
+
+    def __getitem__(self, product: str):
+        value = self._values[self._index[product]]
+        return value.item() if hasattr(value, "item") else value
+
+    def __contains__(self, product) -> bool:
+        return product in self._index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __repr__(self) -> str:
+        return f"TopColumn({dict(self.items())})"
+
+
+class TopOfBook:
+    """
+    Best bid, best ask, mid price, spread and the volumes at the best bid and
+    ask of every product at one tick, each a {product: value} TopColumn.
+
+    For a loaded round these are rows of arrays the round computes once, so
+    reading them costs nothing per tick and does not build any orderbook.
+    """
+
+    FIELDS = ("best_bid", "best_ask", "mid_price", "spread", "bid_volume", "ask_volume")
+    __slots__ = FIELDS
+
+    def __init__(self, index: Dict[str, int], rows: Dict[str, Sequence]) -> None:
+        """
+        :param index: Product -> position in each row.
+        :param rows: Field name -> one value per product, for every name in FIELDS.
+        """
+        for field in self.FIELDS:
+            setattr(self, field, TopColumn(index, rows[field]))
+
+    @classmethod
+    def from_books(cls, books: Dict[str, Dict]) -> "TopOfBook":
+        """
+        Work the fields out from orderbooks, e.g. a streamed tick's.
+
+        :param books: {product: {"BUY": {price: quantity}, "SELL": {price: quantity}}}.
+        """
+        rows: Dict[str, List] = {field: [] for field in cls.FIELDS}
+        for book in books.values():
+            bid = next(iter(book["BUY"]), None)
+            ask = next(iter(book["SELL"]), None)
+            both = bid is not None and ask is not None
+            rows["best_bid"].append(bid)
+            rows["best_ask"].append(ask)
+            rows["mid_price"].append((bid + ask) / 2 if both else None)
+            rows["spread"].append(ask - bid if both else None)
+            rows["bid_volume"].append(None if bid is None else book["BUY"][bid])
+            rows["ask_volume"].append(None if ask is None else book["SELL"][ask])
+        return cls({product: i for i, product in enumerate(books)}, rows)
+
+
+class ReadOnlyBookError(TypeError):
+    """
+    Raised when an algorithm tries to modify the order book it was shown.
+    """
+
+
+class _ReadOnly:
+    __slots__ = ()
+
+    def _refuse(self, *args, **kwargs):
+        raise ReadOnlyBookError(
+            "State.orderbook is read-only; take a .copy() of a book or book side to modify it"
+        )
+
+    __setitem__ = __delitem__ = _refuse
+    pop = popitem = clear = update = setdefault = _refuse
+    add = decrement = fill_at = remove_empty = _refuse
+
+
+class ReadOnlyLadder(_ReadOnly, PriceLadder):
+    """
+    A PriceLadder that shares another ladder's level lists without copying
+    them and refuses writes. It reflects the engine's ladder, so it is only
+    meaningful during the Trader.run call it was passed to.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def of(cls, ladder: PriceLadder) -> "ReadOnlyLadder":
+        return cls._from_lists(ladder.descending, ladder._keys, ladder._prices, ladder._volumes)
+
+
+class ReadOnlyOrderBook(_ReadOnly, OrderBook):
+    """
+    An OrderBook of ReadOnlyLadders over another book's levels.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def of(cls, book: OrderBook) -> "ReadOnlyOrderBook":
+        return cls.from_ladders(ReadOnlyLadder.of(book.bids), ReadOnlyLadder.of(book.asks))
+
+
+class ReadOnlyBooks(_ReadOnly, Mapping):
+    """
+    Read-only {product: ReadOnlyOrderBook} mapping over the engine's books.
+
+    Views are created the first time a product is looked up, so handing the
+    books to an algorithm costs nothing per product it does not read.
+    """
+
+    __slots__ = ("_books", "_views")
+
+    def __init__(self, books: Dict[str, OrderBook]) -> None:
+        self._books = books
+        self._views: Dict[str, ReadOnlyOrderBook] = {}
+
+    def __getitem__(self, product: str) -> ReadOnlyOrderBook:
+        view = self._views.get(product)
+        if view is None:
+            view = self._views[product] = ReadOnlyOrderBook.of(self._books[product])
+        return view
+
+    def __contains__(self, product) -> bool:
+        return product in self._books
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._books)
+
+    def __len__(self) -> int:
+        return len(self._books)
+
+    def __repr__(self) -> str:
+        return f"ReadOnlyBooks({list(self._books)})"
@@ -0,0 +1,243 @@
+import logging
+from typing import Dict, List, Optional, Tuple, Union
+
+from datamodel import Amend, Cancel, Fill, Order, OrderBatch, Portfolio
+from fillledger import ALGO, BOT, FillLedger
+from orderbook import OrderBook
+from ordermatching import match_batch, match_order
+from pretrade import PreTradeGate
+
+
+class OrderEngine:
+    """
+    Tracks the algo's orders by order ID across ticks.
+
+    Each tick, persistent orders still open are matched against the book
+    first, then the new orders in the order they were sent. Whatever is left
+    rests for the bots in price-time order: at each price the oldest order
+    fills first. Orders that are not persistent are dropped at the end of
+    the tick; persistent orders stay open until they fill or are cancelled,
+    so an algo that keeps its quotes only has to send them once.
+
+    The engine matches its own copy of each order, so the Order the algo
+    sent keeps the price and quantity it was sent with; the engine only sets
+    its order_id. Every time an Order that is not persistent is accepted it
+    gets a new ID, so each ID in the ledger is one order. A persistent Order
+    keeps its first ID: sent again while it is open it is already resting
+    and is left as it is, and sent again after it closed it reopens under
+    the same ID.
+
+    Open orders in a product that is not in the orderbook sit the tick out;
+    main keeps the products of open orders active, see main.active_products.
+
+    Orders pass through a PreTradeGate first, which drops invalid ones and
+    lets the matcher skip position limits on ticks where they cannot bind.
+    """
+
+    def __init__(self, ledger: Optional[FillLedger] = None) -> None:
+        """
+        :param ledger: Ledger every fill is written to, a new one if not given.
+        """
+        # Persistent orders by order_id; insertion order is time priority.
+        self.open_orders: Dict[int, Order] = {}
+        self.ledger = ledger if ledger is not None else FillLedger([])
+        # Ledger rows before this one have been handed out by take_fills.
+        self._fills_taken = len(self.ledger)
+        self.gate = PreTradeGate()
+        self._next_id = 1
+        # (product, side, price) -> orders resting there this tick, oldest first.
+        self._queues: Dict[Tuple[str, str, float], List[Order]] = {}
+
+    def take_fills(self) -> List[Fill]:
+        """
+        Fills since the last call. Fill objects are only built here, from the ledger.
+        """
+        fills = self.ledger.since(self._fills_taken)
+        self._fills_taken = len(self.ledger)
+        return fills
+
+    def submit(
+        self,
+        messages: Union[List, OrderBatch, None],
+        orderbook: Dict[str, OrderBook],
+        portfolio: Portfolio,
+        pos_limit: Dict[str, int],
+        timestamp: Optional[int] = None,
+    ) -> Dict[str, OrderBook]:
+        """
+        Check the algo's orders, apply its cancels and amends, then match its
+        open and new orders.
+
+        :param messages: Orders, Cancels and Amends returned by Trader.run, or an OrderBatch.
+        :param orderbook: The orderbook to match with.
+        :param portfolio: The portfolio to be updated.
+        :param pos_limit: The maximum quantity the portfolio can hold.
+        :param timestamp: Tick the fills are recorded at.
+        :return: The algo's resting orders for the bots to trade against.
+        """
+        messages = self.gate.check(messages, orderbook)
+        batch = None
+        if isinstance(messages, OrderBatch):
+            batch, messages = messages, None
+        new_orders = []
+        resting_ids = set()  # persistent orders opened this tick
+        for message in messages or ():
+            if isinstance(message, Cancel):
+                self.cancel(message.order_id)
+            elif isinstance(message, Amend):
+                self.amend(message)
+            else:
+                order = self._accept(message, resting_ids)
+                if order is not None:
+                    new_orders.append(order)
+
+        orders = [order for order in self.open_orders.values() if order.product in orderbook]
+        orders += new_orders
+
+        # None tells the matcher no fill this tick can reach a position limit.
+        limits = None if self.gate.within_limits(orders, batch, portfolio.quantity, pos_limit) else pos_limit
+
+        matched: List[Tuple[Order, float, int]] = []
+        resting = match_order(orders, orderbook, portfolio, limits, matched)
+        for order, price, quantity in matched:
+            order.quantity -= quantity
+            self.ledger.append(timestamp, order.product, price, quantity, ALGO, order.order_id)
+        if batch is not None:
+            orders += self._match_batch(batch, orderbook, portfolio, limits, timestamp, resting)
+
+        self._queues = {}
+        for order in orders:
+            if order.quantity != 0:
+                side = "BUY" if order.quantity > 0 else "SELL"
+                self._queues.setdefault((order.product, side, order.price), []).append(order)
+        if matched:
+            self._close_filled()
+        for order in new_orders:
+            if order.persistent and order.quantity != 0:
+                self.open_orders[order.order_id] = order
+        return resting
+
+    def _accept(self, sent: Order, resting_ids: set) -> Optional[Order]:
+        """
+        The engine's copy of an Order the algo sent, under a new ID unless it
+        is a persistent order that already has one. None if it is a
+        persistent order that is already open.
+
+        :param sent: Order returned by Trader.run.
+        :param resting_ids: IDs of the persistent orders accepted this tick, updated.
+        """
+        order_id = sent.order_id
+        if sent.persistent and order_id is not None and (order_id in self.open_orders or order_id in resting_ids):
+            return None
+        if order_id is None or not sent.persistent:
+            order_id = sent.order_id = self._next_id
+            self._next_id += 1
+        if sent.persistent:
+            resting_ids.add(order_id)
+        order = Order(sent.product, sent.price, sent.quantity, sent.persistent)
+        order.order_id = order_id
+        return order
+
+    def _match_batch(
+        self,
+        batch: OrderBatch,
+        orderbook: Dict[str, OrderBook],
+        portfolio: Portfolio,
+        pos_limit: Optional[Dict[str, int]],
+        timestamp: Optional[int],
+        resting: Dict[str, OrderBook],
+    ) -> List[Order]:
+        """
+        Match a batch after the open orders, adding what is left to resting.
+
+        :return: Orders for the rows left resting, for the bots' queues.
+        """
+        products = batch.product_names()
+        prices = batch.prices.tolist()
+        quantities = batch.quantities.tolist()
+        first_id = self._next_id
+        self._next_id += len(quantities)
+
+        matched: List[Tuple[int, float, int]] = []
+        batch_resting = match_batch(
+            products, prices, quantities, orderbook, portfolio, pos_limit, matched
+        )
+        for row, price, quantity in matched:
+            quantities[row] -= quantity
+            self.ledger.append(timestamp, products[row], price, quantity, ALGO, first_id + row)
+
+        for product, book in batch_resting.items():
+            if product not in resting:
+                resting[product] = book
+                continue
+            for price, quantity in book.bids.items():
+                resting[product].bids.add(price, quantity)
+            for price, quantity in book.asks.items():
+                resting[product].asks.add(price, quantity)
+
+        left = []
+        for row, quantity in enumerate(quantities):
+            if quantity != 0:
+                order = Order(products[row], prices[row], quantity)
+                order.order_id = first_id + row
+                left.append(order)
+        return left
+
+    def settle(self, resting: Dict[str, OrderBook], timestamp: Optional[int] = None) -> None:
+        """
+        Share out what the bots took from the resting books, oldest order first
+        at each price, and close persistent orders that are now filled.
+
+        :param resting: The resting books returned by submit, after the bots traded.
+        :param timestamp: Tick the fills are recorded at.
+        """
+        done = False
+        for (product, side, price), queue in self._queues.items():
+            left = resting[product][side].get(price, 0)
+            taken = sum(abs(order.quantity) for order in queue) - left
+            for order in queue:
+                if taken == 0:
+                    break
+                quantity = min(taken, abs(order.quantity))
+                taken -= quantity
+                if side == "SELL":
+                    quantity = -quantity
+                order.quantity -= quantity
+                done = done or order.quantity == 0
+                self.ledger.append(timestamp, product, price, quantity, BOT, order.order_id)
+        self._queues = {}
+
+        if done:
+            self._close_filled()
+
+    def _close_filled(self) -> None:
+        self.open_orders = {
+            order_id: order for order_id, order in self.open_orders.items() if order.quantity != 0
+        }
+
+    def cancel(self, order_id: int) -> None:
+        if self.open_orders.pop(order_id, None) is None:
+            logging.warning(f"Cannot cancel order {order_id}: it is not open")
+
+    def amend(self, amend: Amend) -> None:
+        order = self.open_orders.get(amend.order_id)
+        if order is None:
+            logging.warning(f"Cannot amend order {amend.order_id}: it is not open")
+            return
+        quantity = order.quantity if amend.quantity is None else amend.quantity
+        price = order.price if amend.price is None else amend.price
+        if quantity == 0:
+            self.cancel(amend.order_id)
+            return
+        if not self.gate.check_amend(price, quantity):
+            return
+        if (quantity > 0) != (order.quantity > 0):
+            logging.warning(f"Cannot amend order {amend.order_id} to the other side")
+            return
+
+        keeps_priority = price == order.price and abs(quantity) <= abs(order.quantity)
+        order.price = price
+        order.quantity = quantity
+        if not keeps_priority:
+            del self.open_orders[amend.order_id]
+            self.open_orders[amend.order_id] = order
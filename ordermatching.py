@@ -1,133 +1,243 @@
-from typing import Dict, List
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 from datamodel import Order, Portfolio
+from orderbook import OrderBook, PriceLadder
 
 def match_order(
     algo_orders: List[Order],
-    orderbook: Dict[str, Dict[str, Dict[int, int]]],
+    orderbook: Dict[str, OrderBook],
     portfolio: Portfolio,
-    pos_limit: Dict[str, int],
-) -> Dict[str, Dict[str, Dict[int, int]]]:
+    pos_limit: Optional[Dict[str, int]],
+    fills: Optional[List[Tuple[Order, float, int]]] = None,
+) -> Dict[str, OrderBook]:
     """
-    Match an order with an order in the orderbook.
+    Match the algo's orders against the orderbook and return what is left to rest.
 
-    :param order: The order to be matched.
+    Orders are matched in the order they were sent. Levels are only ever used
+    up best-first, so every level in front of a product side's cursor is empty
+    and the next order on that side starts there instead of at the top. Each
+    level is stepped past at most once per tick, so matching costs
+    O(orders + levels) while giving the same fills as walking each order
+    through the whole book.
+
+    :param algo_orders: The orders to be matched.
     :param orderbook: The orderbook to match with.
     :param portfolio: The portfolio to be updated.
-    :param pos_limit: The maximum quantity the portfolio can hold.
+    :param pos_limit: The maximum quantity the portfolio can hold, or None if
+        the orders cannot take any position past its limit (see PreTradeGate).
+    :param fills: If given, (order, price, signed quantity) is appended for every fill.
     """
 
-    algo_resting_orders: Dict[str, Dict[str, Dict[int, int]]] = {}
-
-    all_products = set(order.product for order in algo_orders)
-    for product in all_products:
-        if product not in algo_resting_orders:
-            algo_resting_orders[product] = {"BUY": {}, "SELL": {}}
+    algo_resting_orders: Dict[str, OrderBook] = {}
+    # product -> [first bid level with volume, first ask level with volume]
+    cursors: Dict[str, List[int]] = {}
 
     for order in algo_orders:
         product = order.product
-        unfilled_quantity = 0
+        if product not in algo_resting_orders:
+            algo_resting_orders[product] = OrderBook()
+            cursors[product] = [0, 0]
+        cursor = cursors[product]
 
         if order.quantity > 0:
-            unfilled_quantity = match_buy_order(
-                order, orderbook[product]["SELL"], portfolio, pos_limit
+            unfilled_quantity, cursor[1] = match_buy_order(
+                order, orderbook[product].asks, portfolio, pos_limit, cursor[1], fills
             )
 
             if unfilled_quantity > 0:
-                price = order.price
-                book = algo_resting_orders[product]["BUY"]
-                if price in book:
-                    book[price] += unfilled_quantity
-                else:
-                    book[price] = unfilled_quantity
+                algo_resting_orders[product].bids.add(order.price, unfilled_quantity)
 
         elif order.quantity < 0:
-            unfilled_quantity = match_sell_order(
-                order, orderbook[product]["BUY"], portfolio, pos_limit
+            unfilled_quantity, cursor[0] = match_sell_order(
+                order, orderbook[product].bids, portfolio, pos_limit, cursor[0], fills
+            )
+
+            if unfilled_quantity < 0:
+                algo_resting_orders[product].asks.add(order.price, -unfilled_quantity)
+
+    return algo_resting_orders
+
+
+def match_batch(
+    products: Sequence[str],
+    prices: Sequence[float],
+    quantities: Sequence[int],
+    orderbook: Dict[str, OrderBook],
+    portfolio: Portfolio,
+    pos_limit: Optional[Dict[str, int]],
+    fills: Optional[List[Tuple[int, float, int]]] = None,
+) -> Dict[str, OrderBook]:
+    """
+    match_order for orders given as parallel sequences rather than Order objects.
+
+    :param products: Product of each order.
+    :param prices: Limit price of each order.
+    :param quantities: Quantity of each order, positive to buy, negative to sell.
+    :param orderbook: The orderbook to match with.
+    :param portfolio: The portfolio to be updated.
+    :param pos_limit: The maximum quantity the portfolio can hold, or None as for match_order.
+    :param fills: If given, (row, price, signed quantity) is appended for every fill.
+    """
+    algo_resting_orders: Dict[str, OrderBook] = {}
+    cursors: Dict[str, List[int]] = {}
+
+    for row, (product, price, quantity) in enumerate(zip(products, prices, quantities)):
+        if product not in algo_resting_orders:
+            algo_resting_orders[product] = OrderBook()
+            cursors[product] = [0, 0]
+        cursor = cursors[product]
+
+        if quantity > 0:
+            unfilled_quantity, cursor[1] = buy_sweep(
+                product, price, quantity, orderbook[product].asks, portfolio, pos_limit,
+                cursor[1], fills, row,
+            )
+
+            if unfilled_quantity > 0:
+                algo_resting_orders[product].bids.add(price, unfilled_quantity)
+
+        elif quantity < 0:
+            unfilled_quantity, cursor[0] = sell_sweep(
+                product, price, quantity, orderbook[product].bids, portfolio, pos_limit,
+                cursor[0], fills, row,
             )
 
             if unfilled_quantity < 0:
-                price = order.price
-                book = algo_resting_orders[product]["SELL"]
-                unfilled_abs = -unfilled_quantity
-                if price in book:
-                    book[price] += unfilled_abs
-                else:
-                    book[price] = unfilled_abs
-        else:
-            pass
+                algo_resting_orders[product].asks.add(price, -unfilled_quantity)
 
     return algo_resting_orders
 
 
 def match_buy_order(
     order: Order,
-    sell_orders: Dict[int, int],
+    sell_orders: PriceLadder,
     portfolio: Portfolio,
-    pos_limit: Dict[str, int],
-) -> int:
-    product = order.product
-    product_limit = pos_limit[product]
-    limit_price = order.price
-    outstanding_quantity = order.quantity
-
-    for pricepoint in sorted(sell_orders.keys()):
-        if outstanding_quantity == 0:
-            break
+    pos_limit: Optional[Dict[str, int]],
+    start: int = 0,
+    fills: Optional[List[Tuple[Order, float, int]]] = None,
+) -> Tuple[int, int]:
+    """
+    :param start: Index of the first ask level that may have volume left.
+    :param fills: If given, (order, price, quantity) is appended for every fill.
+    :return: The unfilled quantity and the index the next buy can start from.
+    """
+    return buy_sweep(
+        order.product, order.price, order.quantity, sell_orders, portfolio, pos_limit,
+        start, fills, order,
+    )
+
 
+def buy_sweep(
+    product: str,
+    limit_price: float,
+    outstanding_quantity: int,
+    sell_orders: PriceLadder,
+    portfolio: Portfolio,
+    pos_limit: Optional[Dict[str, int]],
+    start: int = 0,
+    fills: Optional[List[Tuple[Any, float, int]]] = None,
+    tag: Any = None,
+) -> Tuple[int, int]:
+    """
+    Fill a buy of outstanding_quantity at up to limit_price from the asks.
+
+    :param tag: Identifies the order in the fills, as (tag, price, quantity).
+    :return: The unfilled quantity and the index the next buy can start from.
+    """
+    if pos_limit is None:
+        capacity = outstanding_quantity
+    else:
+        capacity = int(pos_limit[product] - portfolio.quantity.get(product, 0))
+
+    i = start
+    while i < len(sell_orders) and outstanding_quantity > 0 and capacity > 0:
+        pricepoint = sell_orders.price_at(i)
         if pricepoint > limit_price:
             break
 
-        if sell_orders[pricepoint] > 0:
-            fulfilled_amount = min(
-                int(product_limit - portfolio.quantity.get(product, 0)),
-                outstanding_quantity,
-                sell_orders[pricepoint],
-            )  # quantity before order limit, order quantity remaining, quantity avaliable,
+        available = sell_orders.volume_at(i)
+        if available > 0:
+            # quantity before order limit, order quantity remaining, quantity avaliable
+            fulfilled_amount = min(capacity, outstanding_quantity, available)
 
-            if fulfilled_amount > 0:
-                # Update portfolio
-                portfolio.quantity[product] += fulfilled_amount
-                portfolio.cash -= fulfilled_amount * pricepoint
+            # Update portfolio
+            portfolio.quantity[product] += fulfilled_amount
+            portfolio.cash -= fulfilled_amount * pricepoint
 
-                sell_orders[pricepoint] -= fulfilled_amount
-                outstanding_quantity -= fulfilled_amount
-                # print(f"selling {fulfilled_amount} at {buy_prices[i]}")
+            sell_orders.fill_at(i, fulfilled_amount)
+            if fills is not None:
+                fills.append((tag, pricepoint, fulfilled_amount))
+            outstanding_quantity -= fulfilled_amount
+            capacity -= fulfilled_amount
+            if fulfilled_amount < available:
+                break
+        i += 1
 
-    return outstanding_quantity
+    return outstanding_quantity, i
 
 
 def match_sell_order(
     order: Order,
-    buy_orders: Dict[int, int],
+    buy_orders: PriceLadder,
     portfolio: Portfolio,
-    pos_limit: Dict[str, int],
-) -> int:
-    product = order.product
-    product_limit = pos_limit[product]
-    limit_price = order.price
-    outstanding_quantity = order.quantity
-
-    for pricepoint in sorted(buy_orders.keys(), reverse=True):
-        if outstanding_quantity == 0:
-            break
-
-        if pricepoint < limit_price:
-            break
+    pos_limit: Optional[Dict[str, int]],
+    start: int = 0,
+    fills: Optional[List[Tuple[Order, float, int]]] = None,
+) -> Tuple[int, int]:
+    """
+    :param start: Index of the first bid level that may have volume left.
+    :param fills: If given, (order, price, -quantity) is appended for every fill.
+    :return: The unfilled (negative) quantity and the index the next sell can start from.
+    """
+    return sell_sweep(
+        order.product, order.price, order.quantity, buy_orders, portfolio, pos_limit,
+        start, fills, order,
+    )
 
-        if buy_orders[pricepoint] > 0:
-            fulfilled_amount = min(
-                int(product_limit + portfolio.quantity.get(product, 0)),
-                -outstanding_quantity,
-                buy_orders[pricepoint],
-            )  # quantity before order limit, order quantity remaining, quantity avaliable,
 
-            if fulfilled_amount > 0:
-                # Update portfolio
-                portfolio.quantity[product] -= fulfilled_amount
-                portfolio.cash += fulfilled_amount * pricepoint
+def sell_sweep(
+    product: str,
+    limit_price: float,
+    outstanding_quantity: int,
+    buy_orders: PriceLadder,
+    portfolio: Portfolio,
+    pos_limit: Optional[Dict[str, int]],
+    start: int = 0,
+    fills: Optional[List[Tuple[Any, float, int]]] = None,
+    tag: Any = None,
+) -> Tuple[int, int]:
+    """
+    Fill a sell of -outstanding_quantity at down to limit_price from the bids.
 
-                buy_orders[pricepoint] -= fulfilled_amount
-                outstanding_quantity += fulfilled_amount
-                # print(f"selling {fulfilled_amount} at {buy_prices[i]}")
+    :param tag: Identifies the order in the fills, as (tag, price, -quantity).
+    :return: The unfilled (negative) quantity and the index the next sell can start from.
+    """
+    if pos_limit is None:
+        capacity = -outstanding_quantity
+    else:
+        capacity = int(pos_limit[product] + portfolio.quantity.get(product, 0))
+
+    i = start
+    while i < len(buy_orders) and outstanding_quantity < 0 and capacity > 0:
+        pricepoint = buy_orders.price_at(i)
+        if pricepoint < limit_price:
+            break
 
-    return outstanding_quantity
\ No newline at end of file
+        available = buy_orders.volume_at(i)
+        if available > 0:
+            # quantity before order limit, order quantity remaining, quantity avaliable
+            fulfilled_amount = min(capacity, -outstanding_quantity, available)
+
+            # Update portfolio
+            portfolio.quantity[product] -= fulfilled_amount
+            portfolio.cash += fulfilled_amount * pricepoint
+
+            buy_orders.fill_at(i, fulfilled_amount)
+            if fills is not None:
+                fills.append((tag, pricepoint, -fulfilled_amount))
+            outstanding_quantity += fulfilled_amount
+            capacity -= fulfilled_amount
+            if fulfilled_amount < available:
+                break
+        i += 1
+
+    return outstanding_quantity, i
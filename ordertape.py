@@ -0,0 +1,256 @@
+import json
+import os
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from datamodel import Amend, Cancel, Order, OrderBatch
+from pretrade import REASONS, is_integer
+
+TAPE_VERSION = 2
+HEADER_KEY = "__header__"
+
+# Message kinds
+ORDER = 0
+CANCEL = 1
+AMEND = 2
+BATCH_ROW = 3
+REJECTED = 4  # product is the index in REASONS, quantity the count
+
+# Flags
+PERSISTENT = 1
+FLOAT_PRICE = 2  # the price was a float, not an int
+NO_PRICE = 8  # an Amend that keeps the price
+NO_QUANTITY = 16  # an Amend that keeps the quantity
+
+TAPE_COLUMNS = {
+    "timestamp": np.int64,
+    "kind": np.uint8,
+    "flags": np.uint8,
+    "product": np.int32,
+    "price": np.float64,
+    "quantity": np.int64,
+    "order_id": np.int64,
+}
+
+
+def _order_id(order_id) -> int:
+    """
+    An order ID for the tape: -1, which the engine never gives out, if it is not an integer.
+    """
+    return order_id if is_integer(order_id) else -1
+
+
+class TapeRecorder:
+    """
+    Records what Trader.run returns each tick, so the run can be replayed
+    through the matching engine and bots without the algo (see TapePlayer).
+
+    Only the messages that passed the PreTradeGate are recorded; for those
+    it rejected, the tick's counts by reason are. Messages are kept as one
+    row each in columns of TAPE_COLUMNS and saved as a compressed .npz.
+    Products are stored as indices into the round's products. Wake messages
+    are not recorded, the ticks the algo sleeps through simply have no
+    messages.
+    """
+
+    def __init__(self, products: Sequence[str]) -> None:
+        """
+        :param products: All products in the round, in round order.
+        """
+        self.products = list(products)
+        self.product_index: Dict[str, int] = {product: i for i, product in enumerate(self.products)}
+        self.columns: Dict[str, List] = {name: [] for name in TAPE_COLUMNS}
+        # (after timestamp, product indices or None for every product), when they change.
+        self.subscriptions: List[Tuple[Optional[int], Optional[List[int]]]] = []
+
+    def __len__(self) -> int:
+        return len(self.columns["timestamp"])
+
+    def _row(self, timestamp: int, kind: int, flags: int, product: int, price, quantity, order_id: int) -> None:
+        columns = self.columns
+        columns["timestamp"].append(timestamp)
+        columns["kind"].append(kind)
+        columns["flags"].append(flags)
+        columns["product"].append(product)
+        columns["price"].append(price)
+        columns["quantity"].append(quantity)
+        columns["order_id"].append(order_id)
+
+    def record(
+        self, timestamp: int, messages: Union[List, OrderBatch, None], rejections: Mapping[str, int]
+    ) -> None:
+        """
+        :param timestamp: Tick the messages were sent at.
+        :param messages: What Trader.run returned, after PreTradeGate.check.
+        :param rejections: The messages the gate rejected this tick, counted by reason.
+        """
+        if isinstance(messages, OrderBatch):
+            products = [self.product_index.get(product, -1) for product in messages.products]
+            flags = 0 if np.issubdtype(messages.prices.dtype, np.integer) else FLOAT_PRICE
+            for product, price, quantity in zip(
+                np.array(products)[messages.product_ids].tolist(),
+                messages.prices.tolist(),
+                messages.quantities.tolist(),
+            ):
+                self._row(timestamp, BATCH_ROW, flags, product, price, quantity, -1)
+
+        for message in messages if isinstance(messages, list) else ():
+            if isinstance(message, Cancel):
+                self._row(timestamp, CANCEL, 0, -1, np.nan, 0, _order_id(message.order_id))
+            elif isinstance(message, Amend):
+                flags = (NO_PRICE if message.price is None else 0) | (NO_QUANTITY if message.quantity is None else 0)
+                if not (message.price is None or is_integer(message.price)):
+                    flags |= FLOAT_PRICE
+                price = np.nan if message.price is None else message.price
+                quantity = 0 if message.quantity is None else message.quantity
+                self._row(timestamp, AMEND, flags, -1, price, quantity, _order_id(message.order_id))
+            elif isinstance(message, Order):
+                flags = PERSISTENT if message.persistent else 0
+                if not is_integer(message.price):
+                    flags |= FLOAT_PRICE
+                # An Order sent again keeps the ID the engine gave it, see OrderEngine.
+                self._row(
+                    timestamp, ORDER, flags, self.product_index[message.product], message.price,
+                    message.quantity, _order_id(message.order_id),
+                )
+
+        for reason, count in rejections.items():
+            if count:
+                self._row(timestamp, REJECTED, 0, REASONS.index(reason), np.nan, count, -1)
+
+    def record_subscriptions(self, after: Optional[int], subscriptions: Optional[Sequence[str]]) -> None:
+        """
+        Note the Trader's subscriptions if they changed.
+
+        :param after: Timestamp of the tick they were read after, None before the first.
+        :param subscriptions: The Trader's subscriptions attribute.
+        """
+        indices = None
+        if subscriptions is not None:
+            indices = [self.product_index[p] for p in subscriptions if p in self.product_index]
+        if not self.subscriptions or self.subscriptions[-1][1] != indices:
+            self.subscriptions.append((after, indices))
+
+    def save(self, path: str, round_data_path: str = "", trading_algo: str = "") -> None:
+        """
+        Write the tape. The file is written under a temporary name and moved into place.
+
+        :param path: Tape file, .npz is added if missing.
+        :param round_data_path: Round the tape was recorded on, kept for reference.
+        :param trading_algo: Algo the tape was recorded from, kept for reference.
+        """
+        if not path.endswith(".npz"):
+            path += ".npz"
+        header = {
+            "version": TAPE_VERSION,
+            "products": self.products,
+            "subscriptions": self.subscriptions,
+            "round": round_data_path,
+            "algo": trading_algo,
+        }
+        arrays = {name: np.array(self.columns[name], dtype=dtype) for name, dtype in TAPE_COLUMNS.items()}
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez_compressed(f, **{HEADER_KEY: np.array(json.dumps(header))}, **arrays)
+        os.replace(tmp, path)
+
+
+class TapePlayer:
+    """
+    Plays a tape back in place of the Trader: messages(timestamp) gives the
+    messages Trader.run returned at that tick that passed the PreTradeGate,
+    as new objects, rejections(timestamp) the gate's counts for the rest,
+    and subscriptions follows the Trader's subscriptions as they were
+    recorded.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        :param path: Tape file written by TapeRecorder.save.
+        """
+        with np.load(path, allow_pickle=False) as npz:
+            header = json.loads(str(npz[HEADER_KEY]))
+            if header.get("version") != TAPE_VERSION:
+                raise ValueError(f"{path} is not a version {TAPE_VERSION} order tape")
+            columns = {name: npz[name] for name in TAPE_COLUMNS}
+        self.header = header
+        self.products: List[str] = header["products"]
+        self._rows = {name: values.tolist() for name, values in columns.items()}
+        timestamps = columns["timestamp"]
+        starts = np.flatnonzero(np.r_[True, timestamps[1:] != timestamps[:-1]]) if len(timestamps) else []
+        ends = list(starts[1:]) + [len(timestamps)]
+        self._ticks = {int(timestamps[s]): (int(s), int(e)) for s, e in zip(starts, ends)}
+        self._subscriptions = [
+            (after, None if indices is None else [self.products[i] for i in indices])
+            for after, indices in header["subscriptions"]
+        ]
+        self._next_subscription = 0
+        self.subscriptions: Optional[List[str]] = None
+        self.advance(None)
+
+    def advance(self, after: Optional[int]) -> None:
+        """
+        Move subscriptions on to those read after the tick at timestamp after.
+
+        :param after: Timestamp of the tick just simulated, None before the first.
+        """
+        entries = self._subscriptions
+        while self._next_subscription < len(entries) and (
+            entries[self._next_subscription][0] is None
+            or (after is not None and entries[self._next_subscription][0] <= after)
+        ):
+            self.subscriptions = entries[self._next_subscription][1]
+            self._next_subscription += 1
+
+    def messages(self, timestamp: int) -> Union[List, OrderBatch, None]:
+        """
+        What Trader.run returned at timestamp that passed the gate, None if it sent nothing.
+        """
+        span = self._ticks.get(timestamp)
+        if span is None:
+            return None
+        rows = self._rows
+        kinds = rows["kind"][span[0]:span[1]]
+        if kinds[0] == BATCH_ROW:
+            s, e = span[0], span[0] + kinds.count(BATCH_ROW)
+            return OrderBatch(
+                self.products,
+                rows["product"][s:e],
+                np.array(rows["price"][s:e], dtype=float if rows["flags"][s] & FLOAT_PRICE else np.int64),
+                rows["quantity"][s:e],
+            )
+
+        messages = []
+        for i in range(*span):
+            kind, flags = rows["kind"][i], rows["flags"][i]
+            price = rows["price"][i]
+            if not flags & FLOAT_PRICE and price == price:
+                price = int(price)
+            if kind == ORDER:
+                order = Order(self.products[rows["product"][i]], price, rows["quantity"][i], bool(flags & PERSISTENT))
+                if rows["order_id"][i] >= 0:
+                    order.order_id = rows["order_id"][i]
+                messages.append(order)
+            elif kind == CANCEL:
+                messages.append(Cancel(rows["order_id"][i]))
+            elif kind == AMEND:
+                messages.append(Amend(
+                    rows["order_id"][i],
+                    None if flags & NO_PRICE else price,
+                    None if flags & NO_QUANTITY else rows["quantity"][i],
+                ))
+        return messages
+
+    def rejections(self, timestamp: int) -> Dict[str, int]:
+        """
+        The gate's rejections at timestamp, counted by reason.
+        """
+        span = self._ticks.get(timestamp)
+        if span is None:
+            return {}
+        rows = self._rows
+        return {
+            REASONS[rows["product"][i]]: rows["quantity"][i]
+            for i in range(*span) if rows["kind"][i] == REJECTED
+        }
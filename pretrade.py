@@ -0,0 +1,192 @@
+import logging
+from collections import Counter
+from numbers import Integral, Real
+from typing import Container, Dict, List, Mapping, Optional, Sequence, Union
+
+import numpy as np
+
+from datamodel import Amend, Order, OrderBatch
+
+# Why an order was rejected, checked in this order; an order is counted under the first that fails.
+REASONS = ("type", "product", "price", "quantity")
+
+
+def reject_reasons(
+    type_ok: np.ndarray, product_ok: np.ndarray, prices: np.ndarray, quantities: np.ndarray
+) -> np.ndarray:
+    """
+    Reason code for every order: 0 if it passes, else 1 + its index in REASONS.
+
+    :param type_ok: Whether the price is a real number and the quantity an integer.
+    :param product_ok: Whether the product may be traded this tick.
+    :param prices: Limit prices, as floats.
+    :param quantities: Signed quantities, as integers.
+    """
+    price_ok = np.isfinite(prices) & (prices > 0) & (prices == np.round(prices))
+    reasons = np.zeros(len(prices), dtype=np.int8)
+    checks = (type_ok, product_ok, price_ok, quantities != 0)
+    for code in range(len(checks), 0, -1):
+        reasons[~checks[code - 1]] = code
+    return reasons
+
+
+def is_integer(value) -> bool:
+    """
+    Whether value is an integer, Python or NumPy, other than a bool.
+    """
+    return isinstance(value, Integral) and not isinstance(value, bool)
+
+
+def is_number(value) -> bool:
+    """
+    Whether value is a real number, Python or NumPy, other than a bool.
+    """
+    return isinstance(value, Real) and not isinstance(value, bool)
+
+
+def order_reasons(orders: Sequence[Order], known_products: Optional[Container] = None) -> np.ndarray:
+    """
+    reject_reasons for a list of Orders.
+
+    :param orders: The orders to check.
+    :param known_products: Products that may be traded, e.g. state.orderbook.
+        If None, any non-empty product name passes.
+    """
+    type_ok = np.fromiter(
+        (is_number(order.price) and is_integer(order.quantity) for order in orders),
+        dtype=bool, count=len(orders),
+    )
+    product_ok = np.fromiter(
+        (isinstance(order.product, str) and order.product != ""
+         and (known_products is None or order.product in known_products) for order in orders),
+        dtype=bool, count=len(orders),
+    )
+    prices = np.array(
+        [order.price if ok else np.nan for order, ok in zip(orders, type_ok.tolist())], dtype=float
+    )
+    quantities = np.array(
+        [order.quantity if ok else 0 for order, ok in zip(orders, type_ok.tolist())], dtype=np.int64
+    )
+    return reject_reasons(type_ok, product_ok, prices, quantities)
+
+
+class PreTradeGate:
+    """
+    Checks every order an algo sends in a tick before it reaches the matcher.
+
+    Orders are rejected if their price is not a real number or their quantity
+    not an integer, their product is unknown or not subscribed, their price is
+    not a positive whole number, or their quantity is zero. An Amend is
+    rejected here if its price is not a real number or its quantity not an
+    integer, and its values are checked on the price and quantity it would
+    leave the order with when it is applied, see check_amend. Each rejection
+    is counted by reason in rejections. The gate also projects the worst case
+    for position limits, so the matcher only has to enforce them on ticks
+    where they could bind.
+    """
+
+    def __init__(self) -> None:
+        self.rejections: Counter = Counter()
+
+    def check(
+        self, messages: Union[List, OrderBatch, None], known_products: Mapping
+    ) -> Union[List, OrderBatch, None]:
+        """
+        The messages without the Orders and Amends that fail the checks.
+
+        :param messages: Orders, Cancels and Amends returned by Trader.run, or an OrderBatch.
+        :param known_products: Products that may be traded, e.g. state.orderbook.
+        """
+        if isinstance(messages, OrderBatch):
+            return self._check_batch(messages, known_products)
+        if not messages:
+            return messages
+
+        orders = [message for message in messages if isinstance(message, Order)]
+        bad_amends = [
+            message for message in messages
+            if isinstance(message, Amend) and not (
+                (message.price is None or is_number(message.price))
+                and (message.quantity is None or is_integer(message.quantity))
+            )
+        ]
+        reasons = order_reasons(orders, known_products) if orders else np.zeros(0, dtype=np.int8)
+        if not reasons.any() and not bad_amends:
+            return messages
+
+        self._count(np.concatenate([reasons, np.full(len(bad_amends), 1 + REASONS.index("type"), dtype=np.int8)]))
+        rejected = {id(order) for order, reason in zip(orders, reasons.tolist()) if reason}
+        rejected.update(id(amend) for amend in bad_amends)
+        return [message for message in messages if id(message) not in rejected]
+
+    def check_amend(self, price, quantity) -> bool:
+        """
+        Whether an open order amended to price and quantity passes the checks.
+        The order's product was checked when it was sent. A rejection is counted.
+
+        :param price: The price the Amend would leave the order at.
+        :param quantity: The quantity the Amend would leave the order with.
+        """
+        type_ok = is_number(price) and is_integer(quantity)
+        reasons = reject_reasons(
+            np.array([type_ok]),
+            np.ones(1, dtype=bool),
+            np.array([price if type_ok else np.nan], dtype=float),
+            np.array([quantity if type_ok else 0], dtype=np.int64),
+        )
+        if not reasons[0]:
+            return True
+        self._count(reasons)
+        return False
+
+    def _check_batch(self, batch: OrderBatch, known_products: Mapping) -> OrderBatch:
+        known = np.array([product in known_products for product in batch.products] + [False])
+        ids = batch.product_ids
+        ids = np.where((ids >= 0) & (ids < len(batch.products)), ids, len(batch.products))
+        # The batch's dtypes were checked when it was made.
+        reasons = reject_reasons(
+            np.ones(len(batch), dtype=bool), known[ids], batch.prices.astype(float), batch.quantities
+        )
+        if not reasons.any():
+            return batch
+        self._count(reasons)
+        return batch.select(reasons == 0)
+
+    def _count(self, reasons: np.ndarray) -> None:
+        counts = np.bincount(reasons, minlength=len(REASONS) + 1)[1:]
+        tick = {reason: int(count) for reason, count in zip(REASONS, counts) if count}
+        self.rejections.update(tick)
+        logging.warning(f"Rejected {sum(tick.values())} orders, by reason: {tick}")
+
+    @staticmethod
+    def within_limits(
+        orders: List[Order],
+        batch: Optional[OrderBatch],
+        positions: Dict[str, int],
+        pos_limit: Dict[str, int],
+    ) -> bool:
+        """
+        Whether no set of fills of these orders can take a position past its
+        limit: each product's position plus all its buys, and minus all its
+        sells, is within the limit.
+
+        :param orders: Orders that may fill this tick, e.g. open and new orders.
+        :param batch: A checked OrderBatch that may also fill, or None.
+        :param positions: The portfolio's current positions.
+        :param pos_limit: The maximum quantity the portfolio can hold.
+        """
+        products = [order.product for order in orders]
+        quantities = np.fromiter((order.quantity for order in orders), dtype=np.int64, count=len(products))
+        if batch is not None and len(batch):
+            products = products + batch.product_names()
+            quantities = np.concatenate([quantities, batch.quantities.astype(np.int64)])
+        if not products:
+            return True
+
+        index: Dict[str, int] = {}
+        codes = np.array([index.setdefault(product, len(index)) for product in products])
+        buys = np.bincount(codes, weights=np.maximum(quantities, 0), minlength=len(index))
+        sells = np.bincount(codes, weights=np.maximum(-quantities, 0), minlength=len(index))
+        held = np.array([positions.get(product, 0) for product in index], dtype=float)
+        limits = np.array([pos_limit[product] for product in index], dtype=float)
+        return bool(np.all(held + buys <= limits) and np.all(held - sells >= -limits))
@@ -0,0 +1,122 @@
+import argparse
+import contextlib
+import glob
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+import main
+from dataimport import bot_file_path
+
+SUMMARY_COLUMNS = ["round", "ticks", "final_pnl", "max_drawdown", "seconds", "error"]
+
+
+def round_paths(pattern: str = "Round Data/*/*.csv") -> List[str]:
+    """
+    Market CSVs matching a glob, leaving out the _bots files that go with them.
+
+    :param pattern: Glob pattern, searched recursively if it contains **.
+    """
+    paths = sorted(glob.glob(pattern, recursive=True))
+    bots = {bot_file_path(path) for path in paths}
+    return [path for path in paths if path not in bots]
+
+
+def max_drawdown(pnl: pd.Series) -> float:
+    """
+    Largest fall of the PnL curve from its running peak.
+    """
+    values = pnl.to_numpy(dtype=float)
+    if len(values) == 0:
+        return 0.0
+    return float(np.nanmax(np.fmax.accumulate(values) - values))
+
+
+def run_round(round_path: str, algo_path: str, max_ticks: int, deferred: bool) -> Dict:
+    """
+    Simulate one round without plotting and summarise it.
+
+    Errors, including an algo that fails to import, are recorded in the
+    summary rather than raised, so one bad round does not stop the batch.
+
+    :param round_path: File path of the round's market CSV.
+    :param algo_path: Trading algo file.
+    :param max_ticks: Passed to main.main.
+    :param deferred: Passed to main.main.
+    """
+    start = datetime.now()
+    row = {"round": round_path, "ticks": 0, "final_pnl": np.nan, "max_drawdown": np.nan, "error": ""}
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            quantity_data = main.main(
+                round_path, algo_path, max_ticks=max_ticks, plot=False, deferred=deferred
+            )
+        row["ticks"] = len(quantity_data)
+        if len(quantity_data):
+            row["final_pnl"] = float(quantity_data["PnL"].iloc[-1])
+            row["max_drawdown"] = max_drawdown(quantity_data["PnL"])
+    except (Exception, SystemExit) as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+    row["seconds"] = (datetime.now() - start).total_seconds()
+    return row
+
+
+def run_batch(
+    algo_path: str,
+    pattern: str = "Round Data/*/*.csv",
+    workers: Optional[int] = None,
+    max_ticks: int = main.MAX_TICKS,
+    deferred: bool = True,
+) -> pd.DataFrame:
+    """
+    Run one algo over every round matching a glob, one round per worker process.
+
+    :param algo_path: Trading algo file.
+    :param pattern: Glob pattern of market CSVs, see round_paths.
+    :param workers: Worker processes, defaults to the core count.
+    :param max_ticks: Passed to main.main for every round.
+    :param deferred: Mark from the fill ledger at the end of each round, see main.main.
+    :return: Summary with one row per round, in round order.
+    """
+    paths = round_paths(pattern)
+    if not paths:
+        raise FileNotFoundError(f"No round CSVs match {pattern}")
+    rows = []
+    with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count(), len(paths))) as pool:
+        futures = [pool.submit(run_round, path, algo_path, max_ticks, deferred) for path in paths]
+        for future in as_completed(futures):
+            row = future.result()
+            status = row["error"] or f"PnL {row['final_pnl']:.2f}"
+            print(f"{row['seconds']:7.2f}s  {row['round']}: {status}")
+            rows.append(row)
+    return pd.DataFrame(rows, columns=SUMMARY_COLUMNS).sort_values("round").reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run one algorithm over many rounds in parallel.")
+    parser.add_argument("--algo", default="algorithm_5.py", help="Trading algorithm path")
+    parser.add_argument("--rounds", default="Round Data/*/*.csv", help="Glob of round market CSVs")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: core count)")
+    parser.add_argument(
+        "--max-ticks",
+        type=int,
+        default=main.MAX_TICKS,
+        help="Simulate timestamps before max-ticks * 100 in every round",
+    )
+    parser.add_argument(
+        "--marked",
+        action="store_true",
+        help="Mark the portfolio every tick instead of from the fill ledger at the end",
+    )
+    parser.add_argument("--out", default=None, help="Also write the summary to this CSV")
+    args = parser.parse_args()
+
+    summary = run_batch(args.algo, args.rounds, args.workers, args.max_ticks, not args.marked)
+    print(summary.to_string(index=False))
+    if args.out:
+        summary.to_csv(args.out, index=False)
@@ -0,0 +1,183 @@
+import argparse
+import glob
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+CACHE_VERSION = 1
+HEADER_KEY = "__header__"
+
+
+def cache_path(csv_path: str) -> str:
+    """
+    Path of the binary cache that sits next to a CSV.
+
+    :param csv_path: File path of the CSV.
+    """
+    return os.path.splitext(csv_path)[0] + ".npz"
+
+
+def file_hash(csv_path: str) -> str:
+    """
+    Content hash of a CSV, used when its size matches but its mtime does not.
+
+    :param csv_path: File path of the CSV.
+    """
+    digest = hashlib.sha1()
+    with open(csv_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_fingerprint(csv_path: str, digest: Optional[str] = None) -> Dict:
+    """
+    Size, mtime and content hash of a CSV, stored with anything derived from it.
+
+    :param csv_path: File path of the CSV.
+    :param digest: Content hash of the CSV, computed if not given.
+    """
+    stat = os.stat(csv_path)
+    return {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha1": digest or file_hash(csv_path),
+    }
+
+
+def is_fresh(csv_path: str, fingerprint: Dict) -> bool:
+    """
+    Whether a CSV still matches a stored fingerprint. The content hash is only
+    computed when the size matches but the mtime does not.
+
+    :param csv_path: File path of the CSV.
+    :param fingerprint: Fingerprint from source_fingerprint.
+    """
+    stat = os.stat(csv_path)
+    if fingerprint["size"] != stat.st_size:
+        return False
+    if fingerprint["mtime_ns"] == stat.st_mtime_ns:
+        return True
+    return file_hash(csv_path) == fingerprint["sha1"]
+
+
+def _load(path: str) -> Tuple[Dict, Dict[str, np.ndarray]]:
+    with np.load(path, allow_pickle=False) as npz:
+        header = json.loads(str(npz[HEADER_KEY]))
+        arrays = {name: npz[name] for name in npz.files if name != HEADER_KEY}
+    return header, arrays
+
+
+def _frame(header: Dict, arrays: Dict[str, np.ndarray]) -> pd.DataFrame:
+    return pd.DataFrame({col: arrays[f"col{i}"] for i, col in enumerate(header["columns"])})
+
+
+def write_cache(csv_path: str, df: pd.DataFrame, digest: Optional[str] = None) -> None:
+    """
+    Write a dataframe read from a CSV to the binary cache next to it.
+
+    The file is written under a temporary name and moved into place, so
+    concurrent readers never see a half-written cache.
+
+    :param csv_path: File path of the CSV the dataframe was read from.
+    :param df: The parsed CSV.
+    :param digest: Content hash of the CSV, computed if not given.
+    """
+    header = {"version": CACHE_VERSION, "columns": list(df.columns)}
+    header.update(source_fingerprint(csv_path, digest))
+    arrays = {f"col{i}": df[col].to_numpy() for i, col in enumerate(df.columns)}
+    for name, values in arrays.items():
+        if values.dtype == object:
+            arrays[name] = values.astype(str)
+    target = cache_path(csv_path)
+    tmp = f"{target}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, **{HEADER_KEY: np.array(json.dumps(header))}, **arrays)
+    os.replace(tmp, target)
+
+
+def load_cached(csv_path: str) -> Optional[pd.DataFrame]:
+    """
+    Load a CSV's binary cache, or None if it is missing or stale.
+
+    The cache is fresh when the CSV's size and mtime match the header. If only
+    the mtime differs the content hash decides, and a matching cache is
+    rewritten with the new mtime.
+
+    :param csv_path: File path of the CSV.
+    """
+    path = cache_path(csv_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        header, arrays = _load(path)
+    except (OSError, ValueError, KeyError):
+        return None
+    if header.get("version") != CACHE_VERSION or not is_fresh(csv_path, header):
+        return None
+    df = _frame(header, arrays)
+    if header["mtime_ns"] != os.stat(csv_path).st_mtime_ns:
+        write_cache(csv_path, df, header["sha1"])
+    return df
+
+
+def read_csv_cached(csv_path: str) -> pd.DataFrame:
+    """
+    Read a CSV through its binary cache, rebuilding the cache when stale.
+
+    :param csv_path: File path of the CSV.
+    """
+    df = load_cached(csv_path)
+    if df is not None:
+        return df
+    df = pd.read_csv(csv_path)
+    try:
+        write_cache(csv_path, df)
+    except OSError as e:
+        logging.warning(f"Could not write cache for {csv_path}: {str(e)}")
+    return df
+
+
+def _warm(csv_path: str) -> Tuple[str, str, float]:
+    start = datetime.now()
+    status = "hit" if load_cached(csv_path) is not None else "built"
+    if status == "built":
+        write_cache(csv_path, pd.read_csv(csv_path))
+    return csv_path, status, (datetime.now() - start).total_seconds()
+
+
+def warm_cache(root: str = "Round Data", workers: Optional[int] = None) -> List[Tuple[str, str, float]]:
+    """
+    Build or refresh the cache of every CSV under a directory in parallel.
+
+    :param root: Directory searched recursively for CSVs.
+    :param workers: Number of worker processes, defaults to the core count.
+    """
+    paths = sorted(glob.glob(os.path.join(root, "**", "*.csv"), recursive=True))
+    results = []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = [pool.submit(_warm, path) for path in paths]
+        for future in as_completed(futures):
+            path, status, seconds = future.result()
+            print(f"{status:>5}  {seconds:6.2f}s  {path}")
+            results.append((path, status, seconds))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the round data cache.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    warm = subparsers.add_parser("warm-cache", help="Convert every round CSV to its binary cache")
+    warm.add_argument("--root", default="Round Data", help="Directory containing round CSVs")
+    warm.add_argument("--workers", type=int, default=None, help="Worker processes (default: core count)")
+    args = parser.parse_args()
+
+    if args.command == "warm-cache":
+        warm_cache(args.root, args.workers)
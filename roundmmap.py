@@ -0,0 +1,90 @@
+import json
+import mmap
+import os
+import struct
+from typing import Dict, Tuple
+
+import numpy as np
+
+MAGIC = b"DUFSRND1"
+FORMAT_VERSION = 1
+PAGE_SIZE = mmap.ALLOCATIONGRANULARITY
+_PREFIX = struct.Struct("<8sQ")  # magic, header length
+
+
+def round_file_path(csv_path: str) -> str:
+    """
+    Path of the memory-mapped round file that sits next to a round's CSV.
+
+    :param csv_path: File path of CSV containing market data.
+    """
+    return os.path.splitext(csv_path)[0] + ".round"
+
+
+def _align(offset: int) -> int:
+    return -(-offset // PAGE_SIZE) * PAGE_SIZE
+
+
+def write_round_file(path: str, meta: Dict, arrays: Dict[str, np.ndarray]) -> None:
+    """
+    Write arrays to a fixed-layout round file.
+
+    The file starts with a magic string and a JSON header giving the dtype,
+    shape and offset of every array. Each array starts on its own page, so
+    processes that map the file share the same physical pages.
+
+    :param path: File path to write.
+    :param meta: JSON-serialisable metadata stored in the header.
+    :param arrays: Arrays to store, keyed by name.
+    """
+    layout = {}
+    header = {"version": FORMAT_VERSION, "meta": meta, "arrays": layout}
+    # Offsets depend on the header length, so lay out until it stops growing.
+    offset, encoded = 0, b""
+    while _align(_PREFIX.size + len(encoded)) != offset:
+        offset = _align(_PREFIX.size + len(encoded))
+        cursor = offset
+        for name, values in arrays.items():
+            values = np.ascontiguousarray(values)
+            layout[name] = {
+                "dtype": values.dtype.str,
+                "shape": list(values.shape),
+                "offset": cursor,
+            }
+            cursor = _align(cursor + values.nbytes)
+        encoded = json.dumps(header).encode()
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, len(encoded)))
+        f.write(encoded)
+        for name, values in arrays.items():
+            f.seek(layout[name]["offset"])
+            f.write(np.ascontiguousarray(values).tobytes())
+    os.replace(tmp, path)
+
+
+def open_round_file(path: str) -> Tuple[Dict, Dict[str, np.ndarray]]:
+    """
+    Map a round file read-only. No array data is read until it is touched.
+
+    :param path: File path of the round file.
+    """
+    with open(path, "rb") as f:
+        magic, length = _PREFIX.unpack(f.read(_PREFIX.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a round file")
+        header = json.loads(f.read(length))
+    if header["version"] != FORMAT_VERSION:
+        raise ValueError(f"{path} has unsupported version {header['version']}")
+
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        shape = tuple(spec["shape"])
+        if 0 in shape:
+            arrays[name] = np.zeros(shape, dtype=spec["dtype"])
+        else:
+            arrays[name] = np.memmap(
+                path, dtype=spec["dtype"], mode="r", offset=spec["offset"], shape=shape
+            )
+    return header["meta"], arrays
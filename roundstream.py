@@ -0,0 +1,205 @@
+import queue
+import threading
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from dataimport import bot_file_path, count_levels
+from orderbook import OrderBook
+
+CHUNK_SIZE = 100_000
+PREFETCH_TICKS = 1024
+
+Book = Dict[str, Dict[str, Dict[int, int]]]
+# Products of one timestamp's rows, and their levels keyed by (prefix, field).
+TickRows = Tuple[List[str], Dict[Tuple[str, str], np.ndarray]]
+
+
+def iter_tick_groups(file_path: str, chunksize: int = CHUNK_SIZE) -> Iterator[Tuple[int, pd.DataFrame]]:
+    """
+    Read a CSV in chunks and yield its rows one timestamp at a time.
+
+    The file must be sorted by timestamp. Compressed files (.gz, .zst, ...)
+    are decoded on the fly; .zst needs the zstandard package.
+
+    :param file_path: File path of the CSV.
+    :param chunksize: Rows decoded per chunk.
+    """
+    pending = None
+    last_timestamp = None
+    for chunk in pd.read_csv(file_path, chunksize=chunksize, compression="infer"):
+        if pending is not None:
+            chunk = pd.concat([pending, chunk], ignore_index=True)
+        timestamps = chunk["timestamp"].to_numpy()
+        if np.any(np.diff(timestamps) < 0) or (
+            last_timestamp is not None and timestamps[0] < last_timestamp
+        ):
+            raise ValueError(f"{file_path} is not sorted by timestamp")
+        # The last timestamp in a chunk may continue in the next one.
+        split = np.searchsorted(timestamps, timestamps[-1])
+        for timestamp, group in chunk.iloc[:split].groupby("timestamp", sort=False):
+            yield int(timestamp), group
+        pending = chunk.iloc[split:]
+        last_timestamp = timestamps[-1]
+    if pending is not None and len(pending):
+        yield int(pending["timestamp"].iloc[0]), pending
+
+
+def stream_products(file_path: str) -> List[str]:
+    """
+    Products in the first timestamp of a round, read without loading the file.
+
+    :param file_path: File path of CSV containing market data.
+    """
+    timestamp, group = next(iter_tick_groups(file_path, chunksize=1000))
+    return list(dict.fromkeys(group["product"].tolist()))
+
+
+def group_to_rows(group: pd.DataFrame, levels: int) -> TickRows:
+    """
+    The product of each of one timestamp's rows, and their price and volume
+    levels as arrays keyed by (prefix, field), e.g. ("bid", "price").
+
+    :param group: Rows of a market or bot CSV sharing one timestamp.
+    :param levels: Price levels per side.
+    """
+    columns = {}
+    for prefix in ("bid", "ask"):
+        for field in ("price", "volume"):
+            names = [f"{prefix}_{field}_{i}" for i in range(1, levels + 1)]
+            columns[prefix, field] = group[names].to_numpy()
+    return group["product"].tolist(), columns
+
+
+def rows_to_book(rows: TickRows, skip_empty: bool, products: Optional[Sequence[str]] = None) -> Book:
+    """
+    Build {product: {"BUY": {...}, "SELL": {...}}} from group_to_rows.
+
+    :param rows: One timestamp's rows, see group_to_rows.
+    :param skip_empty: Leave out levels with no volume, as for bot orders.
+    :param products: Products to build, in this order. Rows of any other
+        product are dropped before their levels are decoded. Defaults to
+        every product, in file order.
+    """
+    names, columns = rows
+    # A product's first row wins.
+    first: Dict[str, int] = {}
+    for i, product in enumerate(names):
+        first.setdefault(product, i)
+    if products is not None:
+        first = {product: first[product] for product in products if product in first}
+    if not first:
+        return {}
+
+    index = list(first.values())
+    levels = {key: values[index].tolist() for key, values in columns.items()}
+    book = {}
+    for j, product in enumerate(first):
+        sides = {}
+        for side, prefix in (("BUY", "bid"), ("SELL", "ask")):
+            prices = levels[prefix, "price"][j]
+            volumes = levels[prefix, "volume"][j]
+            if skip_empty:
+                sides[side] = {p: v for p, v in zip(prices, volumes) if v > 0}
+            else:
+                sides[side] = dict(zip(prices, volumes))
+        book[product] = sides
+    return book
+
+
+def _aligned_rows(file_path: str, chunksize: int) -> Iterator[Tuple[int, TickRows, Optional[TickRows]]]:
+    market = iter_tick_groups(file_path, chunksize)
+    bots = iter_tick_groups(bot_file_path(file_path), chunksize)
+    levels = bot_levels = None
+    bot_timestamp, bot_group = next(bots, (None, None))
+
+    for timestamp, group in market:
+        if levels is None:
+            levels = count_levels(group)
+        while bot_timestamp is not None and bot_timestamp < timestamp:
+            bot_timestamp, bot_group = next(bots, (None, None))
+        bot_rows = None
+        if bot_timestamp == timestamp:
+            if bot_levels is None:
+                bot_levels = count_levels(bot_group)
+            bot_rows = group_to_rows(bot_group, bot_levels)
+        yield timestamp, group_to_rows(group, levels), bot_rows
+
+
+def _tick_books(
+    market: TickRows, bots: Optional[TickRows], products: Optional[Sequence[str]]
+) -> Tuple[Dict[str, OrderBook], Book]:
+    orderbook = {
+        product: OrderBook(sides["BUY"], sides["SELL"])
+        for product, sides in rows_to_book(market, False, products).items()
+    }
+    bot_orders = {product: {"BUY": {}, "SELL": {}} for product in orderbook}
+    if bots is not None:
+        for product, sides in rows_to_book(bots, True, list(orderbook)).items():
+            bot_orders[product] = sides
+    return orderbook, bot_orders
+
+
+def stream_round(
+    file_path: str,
+    chunksize: int = CHUNK_SIZE,
+    prefetch: int = PREFETCH_TICKS,
+    active: Optional[Sequence[str]] = None,
+) -> Iterator[Tuple[int, Dict[str, OrderBook], Book]]:
+    """
+    Stream a round tick by tick without loading it into memory.
+
+    The market and bot CSVs are read in lockstep chunks on a background
+    thread, so the first ticks can be simulated while later chunks are still
+    being decoded. At most `prefetch` decoded ticks are buffered. Yields
+    (timestamp, orderbook, bot_orders); products with no bot row at a
+    timestamp get empty bot orders.
+
+    The background thread only parses rows into arrays. Each tick's books
+    are built as it is yielded, and only for the products in active, so the
+    rows of other products never become dicts.
+
+    :param file_path: File path of CSV containing market data.
+    :param chunksize: Rows decoded per chunk.
+    :param prefetch: Maximum number of decoded ticks waiting to be consumed.
+    :param active: Products to build books for, in this order, read afresh
+        each tick so the caller can update it in place. Products with no row
+        at a timestamp are left out. Defaults to every product.
+    """
+    buffer: "queue.Queue" = queue.Queue(maxsize=prefetch)
+    done = object()
+    stop = threading.Event()
+
+    def offer(item) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce() -> None:
+        try:
+            for item in _aligned_rows(file_path, chunksize):
+                if not offer(item):
+                    return
+            offer(done)
+        except BaseException as e:
+            offer(e)
+
+    worker = threading.Thread(target=produce, name="round-stream", daemon=True)
+    worker.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is done:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            timestamp, market, bots = item
+            yield (timestamp, *_tick_books(market, bots, active))
+    finally:
+        stop.set()
+        worker.join()
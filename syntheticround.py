@@ -0,0 +1,272 @@
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+MODELS = ("random_walk", "pairs", "etf")
+TICK_SIZE = 100
+AR_BLOCK = 64
+
+
+def market_columns(levels: int) -> List[str]:
+    """
+    Column order of a round's market CSV.
+
+    :param levels: Price levels per side.
+    """
+    columns = ["timestamp"]
+    for side in ("bid", "ask"):
+        for i in range(1, levels + 1):
+            columns += [f"{side}_price_{i}", f"{side}_volume_{i}"]
+    return columns + ["product"]
+
+
+BOT_COLUMNS = ["bid_price_1", "bid_volume_1", "ask_price_1", "ask_volume_1", "product", "timestamp"]
+
+
+def ar1(shocks: np.ndarray, phi: float) -> np.ndarray:
+    """
+    Run x[t] = phi * x[t-1] + shocks[t] down the first axis.
+
+    Each block of AR_BLOCK ticks is solved in closed form with a cumulative
+    sum, so the Python loop runs once per block rather than once per tick.
+
+    :param shocks: Innovations, shape [ticks, series].
+    :param phi: Autoregressive coefficient, 0 < phi < 1.
+    """
+    out = np.empty_like(shocks)
+    powers = phi ** np.arange(AR_BLOCK, dtype=float)
+    carry = np.zeros(shocks.shape[1])
+    for start in range(0, len(shocks), AR_BLOCK):
+        block = shocks[start:start + AR_BLOCK]
+        p = powers[: len(block), None]
+        values = np.cumsum(block / p, axis=0) * p + p * phi * carry
+        out[start:start + AR_BLOCK] = values
+        carry = values[-1]
+    return out
+
+
+def random_walks(rng: np.random.Generator, ticks: int, count: int, volatility: float) -> np.ndarray:
+    start = rng.uniform(80, 400, size=count)
+    return start + np.cumsum(rng.normal(0, volatility, size=(ticks, count)), axis=0)
+
+
+def simulate_mids(
+    model: str, products: int, ticks: int, rng: np.random.Generator, volatility: float
+) -> Tuple[List[str], np.ndarray]:
+    """
+    Simulate mid prices for every product, shape [ticks, products].
+
+    random_walk: independent random walks.
+    pairs: products in pairs, the second leg is the first times a hedge ratio
+        plus a mean-reverting spread (an odd product out is a random walk).
+    etf: baskets like Round 2, a third of the products are ETFs priced as a
+        weighted sum of three underlying bonds plus mean-reverting noise.
+
+    :param model: One of MODELS.
+    :param products: Number of products.
+    :param ticks: Number of ticks.
+    :param rng: Random generator.
+    :param volatility: Standard deviation of the per-tick price change.
+    """
+    if model == "random_walk":
+        names = [f"PRODUCT_{i + 1}" for i in range(products)]
+        return names, random_walks(rng, ticks, products, volatility)
+
+    if model == "pairs":
+        pairs = products // 2
+        names, columns = [], []
+        legs = random_walks(rng, ticks, pairs, volatility)
+        ratios = rng.uniform(0.5, 2.0, size=pairs)
+        spreads = ar1(rng.normal(0, volatility * 2, size=(ticks, pairs)), 0.98)
+        for i in range(pairs):
+            names += [f"PAIR{i + 1}_A", f"PAIR{i + 1}_B"]
+            columns += [legs[:, i], legs[:, i] * ratios[i] + spreads[:, i]]
+        if products % 2:
+            names.append("PRODUCT_1")
+            columns.append(random_walks(rng, ticks, 1, volatility)[:, 0])
+        return names, np.column_stack(columns)
+
+    if model == "etf":
+        etfs = max(1, products // 3)
+        bonds = products - etfs
+        if bonds < 1:
+            raise ValueError("The etf model needs at least two products")
+        underlying = random_walks(rng, ticks, bonds, volatility)
+        weights = np.zeros((bonds, etfs))
+        for j in range(etfs):
+            members = rng.choice(bonds, size=min(3, bonds), replace=False)
+            weights[members, j] = rng.choice([0.5, 1.0])
+        noise = ar1(rng.normal(0, volatility, size=(ticks, etfs)), 0.9)
+        names = [f"bond{i + 1}" for i in range(bonds)] + [f"ETF{j + 1}" for j in range(etfs)]
+        return names, np.hstack([underlying, underlying @ weights + noise])
+
+    raise ValueError(f"Unknown model {model!r}, expected one of {MODELS}")
+
+
+def make_round_frames(
+    products: int = 4,
+    ticks: int = 1000,
+    levels: int = 3,
+    bot_intensity: float = 0.5,
+    model: str = "random_walk",
+    volatility: float = 0.5,
+    seed: Optional[int] = None,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Generate market and bot dataframes with the same schema as the shipped rounds.
+
+    :param products: Number of products.
+    :param ticks: Number of ticks, at timestamps 100, 200, ...
+    :param levels: Price levels per side of the market book.
+    :param bot_intensity: Probability that each side of a bot order has volume.
+    :param model: Price model, one of MODELS.
+    :param volatility: Standard deviation of the per-tick mid price change.
+    :param seed: Seed for the random generator.
+    """
+    rng = np.random.default_rng(seed)
+    names, mids = simulate_mids(model, products, ticks, rng, volatility)
+    count = len(names)
+
+    half_spread = rng.integers(1, 3, size=(ticks, count), dtype=np.int32)
+    mids = np.maximum(np.rint(mids).astype(np.int32), levels + half_spread + 1)
+    bid_1 = mids - half_spread
+    ask_1 = mids + half_spread
+    del mids, half_spread
+    base_volume = rng.uniform(5, 40, size=count)
+
+    market = {"timestamp": np.repeat(np.arange(1, ticks + 1, dtype=np.int32) * TICK_SIZE, count)}
+    for side, best, step in (("bid", bid_1, -1), ("ask", ask_1, 1)):
+        for i in range(levels):
+            # Volumes are uniform on [1, 2 * mean), with deeper levels holding more.
+            high = np.rint(2 * base_volume * (i + 1)).astype(np.int32)
+            volumes = rng.integers(1, high, size=(ticks, count), dtype=np.int32)
+            market[f"{side}_price_{i + 1}"] = (best + step * i).ravel()
+            market[f"{side}_volume_{i + 1}"] = volumes.ravel()
+    market["product"] = pd.Categorical.from_codes(np.tile(np.arange(count), ticks), names)
+
+    # Bots buy around the best ask and sell around the best bid.
+    def bot_volume() -> np.ndarray:
+        active = rng.random((ticks, count)) < bot_intensity
+        volumes = rng.integers(1, 6, size=(ticks, count), dtype=np.int32)
+        return np.where(active, volumes, 0).ravel()
+
+    bots = {
+        "bid_price_1": (ask_1 + rng.integers(-2, 3, size=(ticks, count), dtype=np.int32)).ravel(),
+        "bid_volume_1": bot_volume(),
+        "ask_price_1": (bid_1 + rng.integers(-2, 3, size=(ticks, count), dtype=np.int32)).ravel(),
+        "ask_volume_1": bot_volume(),
+        "product": market["product"],
+        "timestamp": market["timestamp"],
+    }
+    return (
+        pd.DataFrame(market)[market_columns(levels)],
+        pd.DataFrame(bots)[BOT_COLUMNS],
+    )
+
+
+def write_round(file_path: str, **kwargs) -> str:
+    """
+    Generate a round and write its market CSV and the matching _bots CSV.
+
+    :param file_path: File path of the market CSV to write.
+    :param kwargs: Passed to make_round_frames.
+    """
+    from dataimport import bot_file_path
+
+    market, bots = make_round_frames(**kwargs)
+    directory = os.path.dirname(file_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    market.to_csv(file_path, index=False)
+    bots.to_csv(bot_file_path(file_path), index=False)
+    return file_path
+
+
+def scaling_report(
+    tick_counts: List[int],
+    product_counts: List[int],
+    algo: str = "examplealgo.py",
+    model: str = "random_walk",
+    seed: int = 0,
+) -> pd.DataFrame:
+    """
+    Time main.main on generated rounds as the tick and product counts grow.
+
+    :param tick_counts: Numbers of ticks to try.
+    :param product_counts: Numbers of products to try.
+    :param algo: Trading algorithm file run on every round.
+    :param model: Price model used for the rounds.
+    :param seed: Seed for the random generator.
+    """
+    import main
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for products in product_counts:
+            for ticks in tick_counts:
+                path = write_round(
+                    os.path.join(tmp, f"Synthetic_{products}x{ticks}.csv"),
+                    products=products, ticks=ticks, model=model, seed=seed,
+                )
+                start = datetime.now()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    main.main(path, algo, max_ticks=ticks + 1, plot=False)
+                seconds = (datetime.now() - start).total_seconds()
+                rows.append({
+                    "products": products,
+                    "ticks": ticks,
+                    "rows": products * ticks,
+                    "seconds": seconds,
+                    "us_per_tick": seconds / ticks * 1e6,
+                    "us_per_row": seconds / (products * ticks) * 1e6,
+                })
+                print(f"  products={products}, ticks={ticks} → {seconds:.2f}s")
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic rounds and time the engine on them.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generate = subparsers.add_parser("generate", help="Write a synthetic round")
+    generate.add_argument("--out", default="Round Data/Synthetic/Synthetic.csv", help="Market CSV path")
+    generate.add_argument("--products", type=int, default=4)
+    generate.add_argument("--ticks", type=int, default=1000)
+    generate.add_argument("--levels", type=int, default=3)
+    generate.add_argument("--bot-intensity", type=float, default=0.5)
+    generate.add_argument("--model", choices=MODELS, default="random_walk")
+    generate.add_argument("--volatility", type=float, default=0.5)
+    generate.add_argument("--seed", type=int, default=None)
+
+    report = subparsers.add_parser("scaling-report", help="Time main.main as ticks and products grow")
+    report.add_argument("--ticks", type=int, nargs="+", default=[1000, 10000, 100000])
+    report.add_argument("--products", type=int, nargs="+", default=[4, 16, 64])
+    report.add_argument("--algo", default="examplealgo.py")
+    report.add_argument("--model", choices=MODELS, default="random_walk")
+    report.add_argument("--csv", default=None, help="Also write the report to this CSV")
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        path = write_round(
+            args.out,
+            products=args.products,
+            ticks=args.ticks,
+            levels=args.levels,
+            bot_intensity=args.bot_intensity,
+            model=args.model,
+            volatility=args.volatility,
+            seed=args.seed,
+        )
+        print(f"Wrote {path}")
+    elif args.command == "scaling-report":
+        df_report = scaling_report(args.ticks, args.products, args.algo, args.model)
+        print(df_report.to_string(index=False))
+        if args.csv:
+            df_report.to_csv(args.csv, index=False)
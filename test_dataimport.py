@@ -0,0 +1,67 @@
+import pandas as pd
+import pytest
+
+from dataimport import RoundData, RoundDataError, bot_file_path, load_round
+from syntheticround import make_round_frames, write_round
+
+
+@pytest.fixture
+def frames():
+    return make_round_frames(products=3, ticks=20, seed=5)
+
+
+def problems(market, bots):
+    with pytest.raises(RoundDataError) as info:
+        RoundData.from_frames(market, bots)
+    return str(info.value)
+
+
+def test_aligned_round_is_valid(frames):
+    data = RoundData.from_frames(*frames)
+    assert data.ticks == 20
+    assert data.products == ["PRODUCT_1", "PRODUCT_2", "PRODUCT_3"]
+
+
+def test_duplicate_rows(frames):
+    market, bots = frames
+    assert "1 duplicate market rows (first at timestamp 500, PRODUCT_2)" in problems(
+        pd.concat([market, market.iloc[[13]]]), bots
+    )
+    assert "2 duplicate bot rows" in problems(market, pd.concat([bots, bots.iloc[[0, 1]]]))
+
+
+def test_missing_market_row(frames):
+    market, bots = frames
+    message = problems(market.drop(index=4), bots)
+    assert "1 market rows missing (first at timestamp 200, PRODUCT_2)" in message
+    assert "1 bot rows with no matching market row" in message
+
+
+def test_missing_bot_row(frames):
+    market, bots = frames
+    message = problems(market, bots.drop(index=[7, 8]))
+    assert "2 bot rows missing (first at timestamp 300, PRODUCT_2)" in message
+    assert "no matching market row" not in message
+
+
+def test_bot_row_outside_market_timestamps(frames):
+    market, bots = frames
+    extra = bots.iloc[[0]].assign(timestamp=150)
+    assert problems(market, pd.concat([bots, extra])) == (
+        "Invalid round data: 1 bot rows with no matching market row"
+    )
+
+
+def test_crossed_book(frames):
+    market, bots = frames
+    market.loc[5, "ask_price_1"] = market.loc[5, "bid_price_1"]
+    assert "1 crossed market books (first at timestamp 200, PRODUCT_3)" in problems(market, bots)
+
+
+def test_load_round_validates(tmp_path):
+    path = write_round(str(tmp_path / "round.csv"), products=2, ticks=10, seed=1)
+    bots = pd.read_csv(bot_file_path(path))
+    bots.iloc[:-1].to_csv(bot_file_path(path), index=False)
+    with pytest.raises(RoundDataError, match="1 bot rows missing"):
+        load_round(path, use_cache=False)
+    assert load_round(path, use_cache=False, validate=False).ticks == 10
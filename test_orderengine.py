@@ -0,0 +1,157 @@
+from datamodel import Amend, Cancel, Order, Portfolio
+from orderbook import OrderBook
+from main import active_products
+from orderengine import OrderEngine
+
+PRODUCT = "STOCK"
+POS_LIMIT = {PRODUCT: 100}
+
+
+def new_portfolio() -> Portfolio:
+    portfolio = Portfolio()
+    portfolio.quantity[PRODUCT] = 0
+    return portfolio
+
+
+def tick(engine, messages, portfolio, bids=None, asks=None, bot_takes=None, timestamp=0):
+    """
+    Submit messages against a one-product book, let the bots take
+    {(side, price): quantity} from the algo's resting orders, then settle.
+    """
+    book = {PRODUCT: OrderBook(bids or {}, asks or {})}
+    resting = engine.submit(messages, book, portfolio, POS_LIMIT, timestamp)
+    for (side, price), quantity in (bot_takes or {}).items():
+        resting[PRODUCT][side].decrement(price, quantity)
+    engine.settle(resting, timestamp)
+    return resting
+
+
+def test_reused_order_fills_every_tick():
+    engine, portfolio = OrderEngine(), new_portfolio()
+    order = Order(PRODUCT, 10, 3)
+    for timestamp in range(3):
+        tick(engine, [order], portfolio, asks={10: 5}, timestamp=timestamp)
+    assert portfolio.quantity[PRODUCT] == 9
+    assert (order.price, order.quantity) == (10, 3)
+    # Each placement is a new order with its own ID.
+    assert order.order_id == 3
+    assert [fill.order_id for fill in engine.take_fills()] == [1, 2, 3]
+    assert not engine.gate.rejections
+
+
+def test_resent_persistent_order_opens_once():
+    engine, portfolio = OrderEngine(), new_portfolio()
+    order = Order(PRODUCT, 9, 5, persistent=True)
+    tick(engine, [order, order], portfolio, asks={10: 5})
+    tick(engine, [order], portfolio, asks={10: 5}, timestamp=1)
+    assert list(engine.open_orders) == [order.order_id]
+    assert engine.open_orders[order.order_id] is not order
+    resting = tick(engine, [order], portfolio, asks={10: 5}, timestamp=2)
+    assert resting[PRODUCT].bids.get(9) == 5
+
+
+def test_partial_fill_leaves_rest_open():
+    engine, portfolio = OrderEngine(), new_portfolio()
+    order = Order(PRODUCT, 10, 10, persistent=True)
+    tick(engine, [order], portfolio, asks={10: 4})
+    assert portfolio.quantity[PRODUCT] == 4
+    assert engine.open_orders[order.order_id].quantity == 6
+    assert order.quantity == 10
+
+    tick(engine, [], portfolio, asks={10: 20}, timestamp=1)
+    assert portfolio.quantity[PRODUCT] == 10
+    assert not engine.open_orders
+    assert [fill.quantity for fill in engine.take_fills()] == [4, 6]
+
+
+def test_cancel_closes_order():
+    engine, portfolio = OrderEngine(), new_portfolio()
+    order = Order(PRODUCT, 9, 5, persistent=True)
+    tick(engine, [order], portfolio, asks={10: 5})
+    tick(engine, [Cancel(order.order_id)], portfolio, asks={9: 5}, timestamp=1)
+    assert not engine.open_orders
+    assert portfolio.quantity[PRODUCT] == 0
+
+
+def test_amend_priority():
+    engine, portfolio = OrderEngine(), new_portfolio()
+    first = Order(PRODUCT, 11, -5, persistent=True)
+    second = Order(PRODUCT, 11, -5, persistent=True)
+    tick(engine, [first, second], portfolio, bids={10: 5})
+
+    # Reducing the quantity keeps first at the front of the queue.
+    tick(engine, [Amend(first.order_id, quantity=-3)], portfolio, bids={10: 5}, timestamp=1)
+    assert list(engine.open_orders) == [first.order_id, second.order_id]
+    assert engine.open_orders[first.order_id].quantity == -3
+    assert first.quantity == -5
+
+    # Increasing it sends first to the back.
+    tick(engine, [Amend(first.order_id, quantity=-6)], portfolio, bids={10: 5}, timestamp=2)
+    assert list(engine.open_orders) == [second.order_id, first.order_id]
+
+    # Amending to the other side is refused.
+    tick(engine, [Amend(second.order_id, quantity=4)], portfolio, bids={10: 5}, timestamp=3)
+    assert engine.open_orders[second.order_id].quantity == -5
+
+
+def test_settle_fills_oldest_first():
+    engine, portfolio = OrderEngine(), new_portfolio()
+    first = Order(PRODUCT, 11, -5, persistent=True)
+    second = Order(PRODUCT, 11, -5, persistent=True)
+    tick(engine, [first], portfolio, bids={10: 5})
+    tick(engine, [second], portfolio, bids={10: 5}, bot_takes={("SELL", 11): 7}, timestamp=1)
+    fills = engine.take_fills()
+    assert [(fill.order_id, fill.quantity) for fill in fills] == [(first.order_id, -5), (second.order_id, -2)]
+    assert list(engine.open_orders) == [second.order_id]
+    assert engine.open_orders[second.order_id].quantity == -3
+
+
+def test_invalid_amend_is_rejected():
+    engine, portfolio = OrderEngine(), new_portfolio()
+    order = Order(PRODUCT, 9, 5, persistent=True)
+    tick(engine, [order], portfolio, asks={10: 5})
+    for amend in (Amend(order.order_id, price=-7.5, quantity=2), Amend(order.order_id, price=9.5),
+                  Amend(order.order_id, quantity=2.5), Amend(order.order_id, price="9")):
+        tick(engine, [amend], portfolio, asks={10: 5}, timestamp=1)
+    open_order = engine.open_orders[order.order_id]
+    assert (open_order.price, open_order.quantity) == (9, 5)
+    assert engine.gate.rejections == {"price": 2, "type": 2}
+
+
+def test_is_valid_matches_gate():
+    orders = [Order(PRODUCT, 10, 1), Order(PRODUCT, 10.0, -1), Order(PRODUCT, 10.5, 1), Order(PRODUCT, -10, 1),
+              Order(PRODUCT, 10, 0), Order(PRODUCT, 10, 1.0), Order(PRODUCT, "10", 1), Order("OTHER", 10, 1)]
+    engine, portfolio = OrderEngine(), new_portfolio()
+    book = {PRODUCT: OrderBook()}
+    accepted = engine.gate.check(orders, book)
+    assert [order.is_valid(book) for order in orders] == [order in accepted for order in orders]
+    assert sum(engine.gate.rejections.values()) == 6
+
+
+def test_closed_persistent_order_reopens_under_its_id():
+    engine, portfolio = OrderEngine(), new_portfolio()
+    order = Order(PRODUCT, 10, 2, persistent=True)
+    tick(engine, [order], portfolio, asks={10: 5})
+    tick(engine, [order], portfolio, asks={10: 5}, timestamp=1)
+    assert [fill.order_id for fill in engine.take_fills()] == [1, 1]
+    assert order.order_id == 1
+
+
+class Subscriber:
+    def __init__(self, subscriptions):
+        self.subscriptions = subscriptions
+
+
+def test_open_orders_keep_product_active():
+    engine, portfolio = OrderEngine(), new_portfolio()
+    portfolio.quantity["OTHER"] = 0
+    order = Order(PRODUCT, 9, 5, persistent=True)
+    tick(engine, [order], portfolio, asks={10: 5})
+
+    products = [PRODUCT, "OTHER"]
+    algo = Subscriber(["OTHER"])
+    assert active_products(algo, products, portfolio, [PRODUCT, "OTHER"], engine.open_orders) == ["OTHER", PRODUCT]
+
+    # Once the order is cancelled the product can drop out.
+    tick(engine, [Cancel(order.order_id)], portfolio, asks={10: 5}, timestamp=1)
+    assert active_products(algo, products, portfolio, [PRODUCT, "OTHER"], engine.open_orders) == ["OTHER"]
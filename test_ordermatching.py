@@ -0,0 +1,117 @@
+import random
+from typing import Dict, List
+
+import pytest
+
+from datamodel import Order, Portfolio
+from orderbook import OrderBook
+from ordermatching import match_order
+from pretrade import PreTradeGate
+
+PRODUCTS = ["A", "B"]
+POS_LIMIT = {product: 60 for product in PRODUCTS}
+
+
+def reference_match_order(
+    algo_orders: List[Order],
+    orderbook: Dict[str, Dict[str, Dict[int, int]]],
+    portfolio: Portfolio,
+    pos_limit: Dict[str, int],
+) -> Dict[str, Dict[str, Dict[int, int]]]:
+    """
+    The order-by-order matcher match_order replaced: each order walks its
+    product's dict book from the best level.
+    """
+    resting = {order.product: {"BUY": {}, "SELL": {}} for order in algo_orders}
+    for order in algo_orders:
+        product, outstanding = order.product, order.quantity
+        if outstanding > 0:
+            levels = orderbook[product]["SELL"]
+            for price in sorted(levels):
+                if outstanding == 0 or price > order.price:
+                    break
+                filled = min(int(pos_limit[product] - portfolio.quantity[product]), outstanding, levels[price])
+                if filled > 0:
+                    portfolio.quantity[product] += filled
+                    portfolio.cash -= filled * price
+                    levels[price] -= filled
+                    outstanding -= filled
+            if outstanding > 0:
+                book = resting[product]["BUY"]
+                book[order.price] = book.get(order.price, 0) + outstanding
+        elif outstanding < 0:
+            levels = orderbook[product]["BUY"]
+            for price in sorted(levels, reverse=True):
+                if outstanding == 0 or price < order.price:
+                    break
+                filled = min(int(pos_limit[product] + portfolio.quantity[product]), -outstanding, levels[price])
+                if filled > 0:
+                    portfolio.quantity[product] -= filled
+                    portfolio.cash += filled * price
+                    levels[price] -= filled
+                    outstanding += filled
+            if outstanding < 0:
+                book = resting[product]["SELL"]
+                book[order.price] = book.get(order.price, 0) - outstanding
+    return resting
+
+
+def random_case(rng: random.Random):
+    books, positions, orders = {}, {}, []
+    for product in PRODUCTS:
+        mid = rng.randint(50, 150)
+        books[product] = {
+            "BUY": {mid - 1 - i: rng.randint(1, 30) for i in range(rng.randint(0, 4))},
+            "SELL": {mid + 1 + i: rng.randint(1, 30) for i in range(rng.randint(0, 4))},
+        }
+        positions[product] = rng.randint(-60, 60)
+    for _ in range(rng.randint(1, 10)):
+        product = rng.choice(PRODUCTS)
+        levels = list(books[product]["BUY"]) + list(books[product]["SELL"]) or [100]
+        price = rng.choice(levels) + rng.randint(-2, 2)
+        orders.append(Order(product, price, rng.choice([-1, 1]) * rng.randint(1, 40)))
+    return books, positions, orders
+
+
+def run_both(books, positions, orders, pos_limit=POS_LIMIT):
+    """
+    Match the same orders with match_order and the reference matcher, on copies.
+    """
+    results = []
+    for matcher in ("new", "reference"):
+        portfolio = Portfolio()
+        portfolio.quantity = dict(positions)
+        copies = [Order(order.product, order.price, order.quantity) for order in orders]
+        if matcher == "new":
+            orderbook = {p: OrderBook(dict(sides["BUY"]), dict(sides["SELL"])) for p, sides in books.items()}
+            limits = None if PreTradeGate.within_limits(copies, None, portfolio.quantity, pos_limit) else pos_limit
+            resting = match_order(copies, orderbook, portfolio, limits)
+            resting = {p: {"BUY": dict(book.bids.items()), "SELL": dict(book.asks.items())} for p, book in resting.items()}
+            left = {p: {"BUY": dict(book.bids.items()), "SELL": dict(book.asks.items())} for p, book in orderbook.items()}
+        else:
+            left = {p: {side: dict(levels) for side, levels in sides.items()} for p, sides in books.items()}
+            resting = reference_match_order(copies, left, portfolio, pos_limit)
+        results.append((portfolio.cash, portfolio.quantity, left, resting))
+    return results
+
+
+@pytest.mark.parametrize("seed", range(300))
+def test_matches_reference(seed):
+    new, reference = run_both(*random_case(random.Random(seed)))
+    assert new == reference
+
+
+def test_crossing_orders_same_product():
+    books = {"A": {"BUY": {99: 10, 98: 10}, "SELL": {101: 10, 102: 10}}, "B": {"BUY": {}, "SELL": {}}}
+    orders = [Order("A", 102, 15), Order("A", 98, -15), Order("A", 101, 10), Order("A", 99, -5)]
+    new, reference = run_both(books, {"A": 0, "B": 0}, orders)
+    assert new == reference
+    assert new[1]["A"] == 0
+
+
+def test_orders_hit_position_limit():
+    books = {"A": {"BUY": {99: 50}, "SELL": {101: 50, 102: 50}}, "B": {"BUY": {97: 40}, "SELL": {}}}
+    orders = [Order("A", 102, 30), Order("A", 102, 30), Order("B", 95, -40), Order("B", 97, -10)]
+    new, reference = run_both(books, {"A": 40, "B": -30}, orders)
+    assert new == reference
+    assert new[1] == {"A": 60, "B": -60}
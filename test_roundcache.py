@@ -0,0 +1,68 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from roundcache import HEADER_KEY, cache_path, load_cached, read_csv_cached
+
+CSV = "timestamp,price,product\n100,10,A\n200,11,A\n"
+
+
+def cache_header(csv_path):
+    with np.load(cache_path(csv_path), allow_pickle=False) as npz:
+        return str(npz[HEADER_KEY])
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "round.csv"
+    path.write_text(CSV)
+    read_csv_cached(str(path))
+    return str(path)
+
+
+def set_mtime(path, delta_ns):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + delta_ns))
+
+
+def test_cache_hit_matches_csv(csv_path):
+    assert os.path.exists(cache_path(csv_path))
+    pd.testing.assert_frame_equal(load_cached(csv_path), pd.read_csv(csv_path))
+
+
+def test_size_change_invalidates(csv_path):
+    with open(csv_path, "a") as f:
+        f.write("300,12,A\n")
+    assert load_cached(csv_path) is None
+    assert read_csv_cached(csv_path)["price"].tolist() == [10, 11, 12]
+    assert load_cached(csv_path)["price"].tolist() == [10, 11, 12]
+
+
+def test_mtime_change_with_same_content_is_fresh(csv_path):
+    before = cache_header(csv_path)
+    set_mtime(csv_path, 10 ** 9)
+    df = load_cached(csv_path)
+    assert df is not None
+    pd.testing.assert_frame_equal(df, pd.read_csv(csv_path))
+    # The hash matched, so the cache is rewritten with the new mtime.
+    assert cache_header(csv_path) != before
+    assert str(os.stat(csv_path).st_mtime_ns) in cache_header(csv_path)
+
+
+def test_hash_change_invalidates(csv_path):
+    # Same size, new content and a new mtime: only the hash tells them apart.
+    with open(csv_path, "w") as f:
+        f.write(CSV.replace("11", "12"))
+    set_mtime(csv_path, 10 ** 9)
+    assert os.path.getsize(csv_path) == len(CSV)
+    assert load_cached(csv_path) is None
+    assert read_csv_cached(csv_path)["price"].tolist() == [10, 12]
+
+
+def test_unreadable_cache_is_rebuilt(csv_path):
+    with open(cache_path(csv_path), "wb") as f:
+        f.write(b"not a cache")
+    assert load_cached(csv_path) is None
+    assert read_csv_cached(csv_path)["price"].tolist() == [10, 11]
@@ -0,0 +1,48 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from dataimport import bot_file_path, load_round
+from roundmmap import round_file_path
+from syntheticround import write_round
+
+
+@pytest.fixture
+def round_path(tmp_path):
+    return write_round(str(tmp_path / "round.csv"), products=3, ticks=40, seed=7)
+
+
+def assert_same_round(mapped, loaded):
+    assert mapped.products == loaded.products
+    assert mapped.to_arrays().keys() == loaded.to_arrays().keys()
+    for name, values in loaded.to_arrays().items():
+        np.testing.assert_array_equal(mapped.to_arrays()[name], values, err_msg=name)
+    for row in (0, loaded.ticks // 2, loaded.ticks - 1):
+        for product in loaded.products:
+            assert dict(mapped.orders(row, product).bids.items()) == dict(loaded.orders(row, product).bids.items())
+            assert dict(mapped.orders(row, product).asks.items()) == dict(loaded.orders(row, product).asks.items())
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_mapped_round_matches_loaded(round_path, compact):
+    loaded = load_round(round_path, use_cache=False, compact=compact)
+    built = load_round(round_path, mapped=True, compact=compact)
+    assert os.path.exists(round_file_path(round_path))
+    assert_same_round(built, loaded)
+
+    # The second open maps the file on disk instead of rebuilding it.
+    written = os.stat(round_file_path(round_path)).st_mtime_ns
+    reopened = load_round(round_path, mapped=True, compact=compact)
+    assert os.stat(round_file_path(round_path)).st_mtime_ns == written
+    assert isinstance(reopened.timestamps, np.memmap)
+    assert not reopened.book["bid_prices"].flags.writeable
+    assert_same_round(reopened, loaded)
+
+
+def test_changed_bot_csv_rebuilds_round_file(round_path, tmp_path):
+    load_round(round_path, mapped=True)
+    other = write_round(str(tmp_path / "other.csv"), products=3, ticks=40, seed=8)
+    shutil.copyfile(bot_file_path(other), bot_file_path(round_path))
+    assert_same_round(load_round(round_path, mapped=True), load_round(round_path, use_cache=False))
@@ -0,0 +1,83 @@
+import pandas as pd
+import pytest
+
+from dataimport import bot_file_path, load_round
+from roundstream import stream_round
+from syntheticround import write_round
+
+PRODUCTS = 3
+
+
+@pytest.fixture
+def round_path(tmp_path):
+    return write_round(str(tmp_path / "round.csv"), products=PRODUCTS, ticks=30, seed=3)
+
+
+def loaded_ticks(round_path):
+    """
+    (timestamp, orderbook, bot orders) of every tick of the loaded round, as plain dicts.
+    """
+    data = load_round(round_path, use_cache=False)
+    for row, timestamp in enumerate(data.timestamps.tolist()):
+        flow = data.bot_flow(row)
+        books, bots = {}, {}
+        for product in data.products:
+            book = data.orders(row, product)
+            books[product] = {"BUY": dict(book.bids.items()), "SELL": dict(book.asks.items())}
+            i = data.product_index[product]
+            bots[product] = {
+                side: {prices[i]: quantities[i]} if quantities[i] > 0 else {}
+                for side, prices, quantities in (
+                    ("BUY", flow.buy_prices, flow.buy_quantities),
+                    ("SELL", flow.sell_prices, flow.sell_quantities),
+                )
+            }
+        yield timestamp, books, bots
+
+
+def streamed_ticks(round_path, **kwargs):
+    for timestamp, orderbook, bot_orders in stream_round(round_path, **kwargs):
+        books = {
+            product: {"BUY": dict(book.bids.items()), "SELL": dict(book.asks.items())}
+            for product, book in orderbook.items()
+        }
+        yield timestamp, books, bot_orders
+
+
+# A chunk of 7 rows ends part-way through a timestamp of 3 products.
+@pytest.mark.parametrize("chunksize", [1, 7, PRODUCTS, 100_000])
+def test_streamed_round_matches_loaded(round_path, chunksize):
+    assert list(streamed_ticks(round_path, chunksize=chunksize, prefetch=4)) == list(loaded_ticks(round_path))
+
+
+def test_stream_active_products(round_path):
+    active = ["PRODUCT_3", "PRODUCT_1"]
+    for (timestamp, books, bots), (_, all_books, all_bots) in zip(
+        streamed_ticks(round_path, chunksize=7, active=active), loaded_ticks(round_path)
+    ):
+        assert list(books) == active
+        assert books == {product: all_books[product] for product in active}
+        assert bots == {product: all_bots[product] for product in active}
+
+
+def test_missing_bot_rows_are_empty(round_path):
+    bots = pd.read_csv(bot_file_path(round_path))
+    dropped = bots["timestamp"].unique()[1::2]
+    bots[~bots["timestamp"].isin(dropped)].to_csv(bot_file_path(round_path), index=False)
+    empty = [
+        timestamp
+        for timestamp, books, bot_orders in streamed_ticks(round_path, chunksize=7)
+        if bot_orders == {product: {"BUY": {}, "SELL": {}} for product in books}
+    ]
+    assert set(dropped) <= set(empty)
+
+
+@pytest.mark.parametrize("chunksize", [4, 100_000])
+def test_unsorted_file_is_rejected(round_path, chunksize):
+    market = pd.read_csv(round_path)
+    # Move the second tick after the fourth, across a chunk boundary or within one chunk.
+    order = list(range(PRODUCTS)) + list(range(2 * PRODUCTS, 4 * PRODUCTS)) + list(range(PRODUCTS, 2 * PRODUCTS))
+    order += list(range(4 * PRODUCTS, len(market)))
+    market.iloc[order].to_csv(round_path, index=False)
+    with pytest.raises(ValueError, match="not sorted by timestamp"):
+        list(stream_round(round_path, chunksize=chunksize))